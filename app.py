@@ -1,17 +1,39 @@
+import io
 import os
-from urllib.parse import urlencode
-from typing import Optional, Dict, Any
+import re
+import csv
+import json
+import time
+import base64
+import asyncio
+import logging
+from urllib.parse import urlencode, parse_qs, urlsplit
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 
-import requests
-import feedparser
+import httpx
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from starlette.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
+from arxiv_atom import ArxivFeedParser, AtomParseError
+from cache import cache_from_env
+from local_index import index_from_env
+from metrics import Metrics, TimingMiddleware, stage
+from scheduler import UpstreamUnavailable, scheduler_from_env, request_priority, BULK, BACKGROUND
+from query_compiler import (
+    compile_plan, keyword_set_query, load_keyword_categories, parse_query, unexpanded_wildcards,
+)
+from models import (
+    Work, Author, WORK_FIELDS, AUTHOR_FIELDS, parse_fields, page_to_dict,
+    json_dumps, encode_page, decode_page, strip_doi_prefix, work_dedupe_key,
+)
+
 
 app = FastAPI(title="AI Web Search API")
+logger = logging.getLogger("ai-search")
 
 # CORS so GitHub Pages (or any static host) can call the API
 app.add_middleware(
@@ -22,21 +44,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class CompressionMiddleware:
+    """gzip (or brotli, when brotli-asgi is installed) for everything except live NDJSON search streams."""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        try:
+            from brotli_asgi import BrotliMiddleware
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        except ImportError:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        # Compressors buffer small writes, which would hold back per-source NDJSON lines
+        if scope["type"] == "http" and scope["path"] == "/api/search" and self._is_stream(scope):
+            await self.app(scope, receive, send)
+        else:
+            await self.compressed(scope, receive, send)
+
+    @staticmethod
+    def _is_stream(scope) -> bool:
+        params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return (params.get("stream") or [""])[0].lower() in ("1", "true", "yes", "on")
+
+
+app.add_middleware(CompressionMiddleware)
+
+# Per-stage timings (Server-Timing header, /metrics); added last so it wraps compression too
+metrics = Metrics()
+app.add_middleware(TimingMiddleware, metrics=metrics, routes=lambda: [r.path for r in app.routes])
+
 # Serve /public for local use; on GitHub Pages the frontend is hosted separately
 if os.path.isdir("public"):
     app.mount("/public", StaticFiles(directory="public", html=True), name="public")
 
 
-def http_get_json(url: str, headers: Optional[Dict[str, str]] = None) -> Any:
-    default_headers = {
-        "Accept": "application/json",
-        # Some APIs (e.g., Crossref) require a descriptive User-Agent
-        "User-Agent": os.environ.get("HTTP_USER_AGENT", "ai-search/0.1 (+https://localhost)"),
-    }
-    merged_headers = {**default_headers, **(headers or {})}
-    resp = requests.get(url, headers=merged_headers, timeout=30)
+# Upstream base URLs; override to point at a local stand-in server (e.g. for offline load tests)
+OPENALEX_BASE_URL = os.environ.get("OPENALEX_BASE_URL", "https://api.openalex.org").rstrip("/")
+CROSSREF_BASE_URL = os.environ.get("CROSSREF_BASE_URL", "https://api.crossref.org").rstrip("/")
+ARXIV_BASE_URL = os.environ.get("ARXIV_BASE_URL", "https://export.arxiv.org").rstrip("/")
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # One shared client per worker: httpx keeps a keep-alive pool per upstream host
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            headers={
+                # Some APIs (e.g., Crossref) require a descriptive User-Agent
+                "User-Agent": os.environ.get("HTTP_USER_AGENT", "ai-search/0.1 (+https://localhost)"),
+            },
+            timeout=httpx.Timeout(
+                connect=float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)),
+                read=float(os.environ.get("HTTP_READ_TIMEOUT", 30)),
+                write=10.0,
+                pool=float(os.environ.get("HTTP_POOL_TIMEOUT", 10)),
+            ),
+            limits=httpx.Limits(
+                max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 200)),
+                max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", 50)),
+                keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30)),
+            ),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+@app.on_event("shutdown")
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Per-host token buckets, retries and circuit breakers in front of every upstream call
+upstream_scheduler = scheduler_from_env({
+    "openalex": urlsplit(OPENALEX_BASE_URL).netloc,
+    "crossref": urlsplit(CROSSREF_BASE_URL).netloc,
+    "arxiv": urlsplit(ARXIV_BASE_URL).netloc,
+})
+
+
+async def http_get(url: str, headers: Optional[Dict[str, str]] = None, stream: bool = False) -> httpx.Response:
+    """With stream=True the body is left unread: iterate resp.aiter_bytes(), then aclose() it."""
+    client = get_http_client()
+    send = lambda: client.send(client.build_request("GET", url, headers=headers), stream=stream)
+    # Includes time queued by the scheduler and retries: everything spent waiting on upstream
+    with stage("upstream"):
+        if upstream_scheduler is None:
+            resp = await send()
+        else:
+            resp = await upstream_scheduler.request(urlsplit(url).netloc, send)
+    if stream and resp.is_error:
+        await resp.aread()  # error handlers show the body
     resp.raise_for_status()
-    return resp.json()
+    return resp
+
+
+async def http_get_json(url: str, headers: Optional[Dict[str, str]] = None) -> Any:
+    resp = await http_get(url, headers={"Accept": "application/json", **(headers or {})})
+    with stage("parse"):
+        return resp.json()
 
 
 def is_oa_openalex_work(w: Dict[str, Any]) -> bool:
@@ -66,93 +177,606 @@ def sort_oa_first(source: str, entity: str, data: Dict[str, Any]) -> Dict[str, A
         items = data.get("results")
         if not isinstance(items, list):
             return data
-        if source == "openalex":
-            items.sort(key=lambda w: 1 if is_oa_openalex_work(w) else 0, reverse=True)
-        elif source == "crossref":
-            items.sort(key=lambda w: 1 if is_oa_crossref_item(w) else 0, reverse=True)
-        elif source == "arxiv":
-            items.sort(key=lambda w: 1 if is_oa_arxiv_item(w) else 0, reverse=True)
+        if source in ("openalex", "crossref", "arxiv", "all"):
+            # is_oa was set from the source's own rule when the record was parsed
+            with stage("sort"):
+                items.sort(key=lambda w: 1 if w.is_oa else 0, reverse=True)
         data["results"] = items
         return data
     except Exception:
         return data
 
 
-def search_openalex_works(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
-    base = "https://api.openalex.org/works"
+def work_from_openalex(w: Dict[str, Any]) -> Work:
+    primary = w.get("primary_location") or {}
+    host = w.get("host_venue") or {}
+    best_oa = w.get("best_oa_location") or {}
+    concepts = sorted((c for c in w.get("concepts") or [] if c), key=lambda c: c.get("score") or 0, reverse=True)
+    return Work(
+        id=w.get("id") or "",
+        source="openalex",
+        title=w.get("display_name") or w.get("title") or "",
+        year=w.get("publication_year"),
+        venue=(primary.get("source") or {}).get("display_name") or primary.get("display_name") or host.get("display_name") or "",
+        publisher=host.get("publisher") or (primary.get("source") or {}).get("host_organization_name") or "",
+        doi=strip_doi_prefix(w.get("doi")),
+        link=best_oa.get("landing_page_url") or best_oa.get("url") or primary.get("landing_page_url") or w.get("id") or "",
+        pdf=best_oa.get("pdf_url") or "",
+        is_oa=is_oa_openalex_work(w),
+        authors=[(a.get("author") or {}).get("display_name") or "" for a in w.get("authorships") or []],
+        skills=[n for n in (c.get("display_name") or c.get("id") or "" for c in concepts[:5]) if n],
+        cited_by_count=w.get("cited_by_count"),
+    )
+
+
+def author_from_openalex(a: Dict[str, Any]) -> Author:
+    return Author(
+        id=a.get("id") or "",
+        display_name=a.get("display_name") or "",
+        orcid=a.get("orcid") or "",
+        works_count=a.get("works_count"),
+        cited_by_count=a.get("cited_by_count"),
+    )
+
+
+def work_from_crossref(w: Dict[str, Any]) -> Work:
+    titles = w.get("title") or []
+    venues = w.get("container-title") or []
+    date_parts = (w.get("issued") or {}).get("date-parts") or []
+    links = w.get("link") or []
+    pdf = next((l.get("URL") for l in links if l.get("content-type") == "application/pdf"), "")
+    authors = []
+    for a in w.get("author") or []:
+        name = " ".join(p for p in (a.get("given"), a.get("family")) if p) or a.get("name") or ""
+        authors.append(name)
+    return Work(
+        id=w.get("URL") or w.get("DOI") or "",
+        source="crossref",
+        title=titles[0] if titles else (venues[0] if venues else ""),
+        year=date_parts[0][0] if date_parts and date_parts[0] else None,
+        venue=venues[0] if venues else "",
+        publisher=w.get("publisher") or "",
+        doi=w.get("DOI") or "",
+        link=(links[0].get("URL") if links else None) or w.get("URL") or "",
+        pdf=pdf or "",
+        is_oa=is_oa_crossref_item(w),
+        authors=authors,
+        skills=(w.get("subject") or [])[:5],
+        cited_by_count=w.get("is-referenced-by-count"),
+    )
+
+
+async def search_openalex_works(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    base = f"{OPENALEX_BASE_URL}/works"
     params = {"search": q or None, "per_page": per_page, "cursor": cursor or "*"}
     url = f"{base}?{urlencode({k: v for k, v in params.items() if v})}"
-    data = http_get_json(url)
-    return data
+    data = await http_get_json(url)
+    meta = data.get("meta") or {}
+    with stage("parse"):
+        results = [work_from_openalex(w) for w in data.get("results") or []]
+    return {"results": results, "meta": {"count": meta.get("count", 0), "next_cursor": meta.get("next_cursor")}}
 
 
-def search_openalex_authors(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
-    base = "https://api.openalex.org/authors"
+async def search_openalex_authors(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    base = f"{OPENALEX_BASE_URL}/authors"
     params = {"search": q or None, "per_page": per_page, "cursor": cursor or "*"}
     url = f"{base}?{urlencode({k: v for k, v in params.items() if v})}"
-    data = http_get_json(url)
-    return data
+    data = await http_get_json(url)
+    meta = data.get("meta") or {}
+    with stage("parse"):
+        results = [author_from_openalex(a) for a in data.get("results") or []]
+    return {"results": results, "meta": {"count": meta.get("count", 0), "next_cursor": meta.get("next_cursor")}}
 
 
-def search_crossref(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
-    base = "https://api.crossref.org/works"
-    offset = 0 if not cursor or cursor == "*" else max(0, int(cursor))
-    params = {"query": q or "", "rows": per_page, "offset": offset, "sort": "relevance", "order": "desc"}
+async def search_crossref(q: str, per_page: int, cursor: str, deep_paging: bool = False) -> Dict[str, Any]:
+    base = f"{CROSSREF_BASE_URL}/works"
+    params: Dict[str, Any] = {"query": q or "", "rows": per_page, "sort": "relevance", "order": "desc"}
+    if deep_paging:
+        # Crossref's own cursors stay fast past the 10k offset cap; only used for bulk export
+        params["cursor"] = cursor or "*"
+    else:
+        offset = 0 if not cursor or cursor == "*" else max(0, int(cursor))
+        params["offset"] = offset
     url = f"{base}?{urlencode(params)}"
-    data = http_get_json(url)
+    data = await http_get_json(url)
     message = data.get("message", {})
     items = message.get("items", [])
     total = message.get("total-results", 0)
-    next_cursor = str(offset + len(items)) if offset + len(items) < total else None
-    return {"results": items, "meta": {"count": total, "next_cursor": next_cursor}}
+    if deep_paging:
+        next_cursor = message.get("next-cursor") if len(items) >= per_page else None
+    else:
+        next_cursor = str(offset + len(items)) if offset + len(items) < total else None
+    with stage("parse"):
+        results = [work_from_crossref(w) for w in items]
+    return {"results": results, "meta": {"count": total, "next_cursor": next_cursor}}
 
 
-def search_arxiv(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+def work_from_arxiv(e: Dict[str, Any]) -> Work:
+    # e is one entry from arxiv_atom.ArxivFeedParser
+    year = None
+    if e["published"]:
+        try:
+            year = int(e["published"][:4])
+        except Exception:
+            year = None
+    return Work(
+        id=e["id"],
+        source="arxiv",
+        title=e["title"],
+        year=year,
+        venue="arXiv",
+        doi=e["doi"],
+        link=e["link"],
+        pdf=e["pdf"],
+        is_oa=is_oa_arxiv_item(e),
+        # An <author> without a <name> (or a <category> without a term) comes through as None
+        authors=[name or "" for name in e["authors"]],
+        skills=[term for term in e["categories"] if term],
+    )
+
+
+async def search_arxiv(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
     start = 0 if not cursor or cursor == "*" else max(0, int(cursor))
-    base = "https://export.arxiv.org/api/query"
+    base = f"{ARXIV_BASE_URL}/api/query"
     params = {
-        "search_query": f"all:{q}" if q else "all:*",
+        # q is already native arXiv syntax (see query_compiler.compile_plan)
+        "search_query": q or "all:*",
         "start": start,
         "max_results": per_page,
         "sortBy": "relevance",
     }
     url = f"{base}?{urlencode(params)}"
-    feed = feedparser.parse(url)
-    total = getattr(feed, "opensearch_totalresults", None)
+    resp = await http_get(url, headers={"Accept": "application/atom+xml"}, stream=True)
+    # Parse the Atom body as it arrives instead of buffering the page and building a full tree
+    parser = ArxivFeedParser()
+    results: List[Work] = []
+    chunks = resp.aiter_bytes()
     try:
-        total_i = int(total) if total is not None else start + len(feed.entries)
-    except Exception:
-        total_i = start + len(feed.entries)
-    results = []
-    for e in feed.entries:
-        title = getattr(e, "title", "")
-        link = getattr(e, "link", "")
-        pdf = ""
-        for l in getattr(e, "links", []) or []:
-            if l.get("type") == "application/pdf" or l.get("title") == "pdf":
-                pdf = l.get("href")
+        while True:
+            with stage("upstream"):
+                chunk = await anext(chunks, None)
+            if chunk is None:
                 break
-        year = None
-        if getattr(e, "published", ""):
-            try:
-                year = int(e.published[:4])
-            except Exception:
-                year = None
-        doi = getattr(e, "arxiv_doi", None) or ""
-        authors = [a.get("name") for a in getattr(e, "authors", []) or []]
-        categories = [t.get("term") for t in getattr(e, "tags", []) or []]
-        results.append({
-            "title": title,
-            "link": link,
-            "pdf": pdf,
-            "year": year,
-            "doi": doi,
-            "authors": authors,
-            "categories": categories,
-        })
+            with stage("parse"):
+                results.extend(work_from_arxiv(e) for e in parser.feed(chunk))
+        with stage("parse"):
+            results.extend(work_from_arxiv(e) for e in parser.close())
+    finally:
+        await resp.aclose()
+    total_i = parser.total if parser.total is not None else start + len(results)
     next_cursor = str(start + len(results)) if start + len(results) < total_i else None
     return {"results": results, "meta": {"count": total_i, "next_cursor": next_cursor}}
 
+
+FEDERATED_SOURCES = ("openalex", "crossref", "arxiv")
+# Per-source deadline for federated (source=all) searches, in seconds
+FEDERATED_TIMEOUT = float(os.environ.get("FEDERATED_TIMEOUT", 8))
+
+
+# Shared by every request in this worker; None when CACHE_ENABLED=0
+search_cache = cache_from_env(encode=encode_page, decode=decode_page, on_refresh=lambda: request_priority.set(BACKGROUND))
+
+
+async def cached_search(source: str, entity: str, q: str, per_page: int, cursor: str, loader) -> Dict[str, Any]:
+    if search_cache is None:
+        return await loader()
+    key = search_cache.make_key(source, entity, q, per_page, cursor)
+    return await search_cache.get_or_load(source, key, loader)
+
+
+# Local full-text index (source=local); None unless LOCAL_INDEX_PATH is set
+local_index = index_from_env()
+LOCAL_INDEX_AUTO_INGEST = os.environ.get("LOCAL_INDEX_AUTO_INGEST", "1").lower() not in ("0", "false", "no")
+_ingest_tasks: set = set()
+
+
+def ingest_in_background(page: Dict[str, Any]) -> None:
+    if local_index is None or not LOCAL_INDEX_AUTO_INGEST or not page.get("results"):
+        return
+    async def ingest() -> None:
+        try:
+            await asyncio.to_thread(local_index.ingest, page["results"])
+        except Exception:
+            logger.exception("Local index ingest failed")
+
+    task = asyncio.ensure_future(ingest())
+    _ingest_tasks.add(task)
+    task.add_done_callback(_ingest_tasks.discard)
+
+
+async def search_native(source: str, q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    # q is a native query for `source`; cached per compiled string
+    if source == "crossref":
+        fetch = lambda: search_crossref(q, per_page, cursor)
+    elif source == "arxiv":
+        fetch = lambda: search_arxiv(q, per_page, cursor)
+    else:
+        source = "openalex"
+        fetch = lambda: search_openalex_works(q, per_page, cursor)
+
+    async def loader() -> Dict[str, Any]:
+        # Every upstream page (not cache hits) feeds the local index
+        page = await fetch()
+        ingest_in_background(page)
+        return page
+
+    return await cached_search(source, "works", q, per_page, cursor, loader)
+
+
+class LocalIndexUnavailable(RuntimeError):
+    pass
+
+
+async def search_local(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    if local_index is None:
+        raise LocalIndexUnavailable("Local index is not configured (set LOCAL_INDEX_PATH)")
+    with stage("index"):
+        return await asyncio.to_thread(local_index.search, compile_plan("local", q)[0], per_page, cursor)
+
+
+async def search_works(source: str, q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    if source == "local":
+        return await search_local(q, per_page, cursor)
+    if source not in FEDERATED_SOURCES:
+        source = "openalex"
+    parts = compile_plan(source, q)
+    if len(parts) == 1:
+        return await search_native(source, parts[0], per_page, cursor)
+    return await search_split(source, parts, per_page, cursor)
+
+
+def check_cursor(source: str, q: str, cursor: str) -> None:
+    """Raise ValueError for a cursor `source` can't resume from, so it's a 400 before any upstream call."""
+    if source == "all":
+        for src, pos in decode_federated_cursor(cursor)[0].items():
+            if pos is not None:
+                check_cursor(src, q, pos)
+        return
+    positions = [cursor]
+    if source != "local" and cursor and cursor != "*":
+        parts = compile_plan(source, q)
+        if len(parts) > 1:
+            positions = decode_cursor_map(cursor, [str(i) for i in range(len(parts))])[0].values()
+    if source in ("crossref", "arxiv", "local"):
+        # Offset cursors
+        for pos in positions:
+            if pos not in (None, "", "*") and not pos.isdigit():
+                raise ValueError(f"Invalid cursor: {pos!r}")
+
+
+async def search_split(source: str, parts: Tuple[str, ...], per_page: int, cursor: str) -> Dict[str, Any]:
+    """Run a plan that was split to fit upstream limits: query every part at once, then union and dedupe."""
+    keys = [str(i) for i in range(len(parts))]
+    positions, turn = decode_cursor_map(cursor, keys)
+    shares, turn = page_shares(per_page, [k for k in keys if positions[k] is not None], turn)
+    queried = [k for k, n in shares.items() if n]
+    pages = await asyncio.gather(*(search_native(source, parts[int(k)], shares[k], positions[k]) for k in queried))
+    seen: set = set()
+    count = 0
+    by_part = []
+    for k, page in zip(queried, pages):
+        meta = page.get("meta") or {}
+        count += meta.get("count") or 0
+        positions[k] = meta.get("next_cursor")
+        fresh = []
+        for w in page.get("results") or []:
+            key = work_dedupe_key(w)
+            if key and key in seen:
+                continue
+            if key:
+                seen.add(key)
+            fresh.append(w)
+        by_part.append(fresh)
+    results: List[Work] = []
+    for rank in range(max((len(items) for items in by_part), default=0)):
+        for items in by_part:
+            if rank < len(items):
+                results.append(items[rank])
+    # count is an upper bound: parts can overlap
+    return {"results": results, "meta": {"count": count, "next_cursor": encode_cursor_map(positions, turn)}}
+
+
+def page_shares(per_page: int, streams: List[str], turn: int) -> Tuple[Dict[str, int], int]:
+    """Split per_page exactly between the streams still being paged, so a merged page holds at most
+    per_page works. Leftover slots (every slot, when per_page < len(streams)) go round-robin from
+    `turn`, so each stream keeps advancing; a stream whose share is 0 isn't queried this page.
+    Returns the shares and the turn to store in the next cursor."""
+    if not streams:
+        return {}, 0
+    share, extra = divmod(per_page, len(streams))
+    shares = {k: share + (1 if (i - turn) % len(streams) < extra else 0) for i, k in enumerate(streams)}
+    return shares, (turn + extra) % len(streams)
+
+
+async def search_authors(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    return await cached_search("openalex", "authors", q, per_page, cursor, lambda: search_openalex_authors(q, per_page, cursor))
+
+
+# Composite cursor entry holding page_shares' round-robin position (no stream is named this)
+CURSOR_TURN_KEY = "~turn"
+
+
+def encode_cursor_map(cursors: Dict[str, Optional[str]], turn: int = 0) -> Optional[str]:
+    if not any(cursors.values()):
+        return None
+    data: Dict[str, Any] = {**cursors, CURSOR_TURN_KEY: turn} if turn else cursors
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor_map(cursor: str, keys) -> Tuple[Dict[str, Optional[str]], int]:
+    # Composite cursor over several result streams: "*" starts every stream,
+    # otherwise it maps stream -> position (None = exhausted), plus the round-robin turn
+    if not cursor or cursor == "*":
+        return {k: "*" for k in keys}, 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except Exception:
+        raise ValueError(f"Invalid composite cursor: {cursor!r}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Invalid composite cursor: {cursor!r}")
+    positions = {k: data.get(k) for k in keys}
+    turn = data.get(CURSOR_TURN_KEY, 0)
+    if not isinstance(turn, int) or any(v is not None and not isinstance(v, str) for v in positions.values()):
+        raise ValueError(f"Invalid composite cursor: {cursor!r}")
+    return positions, turn
+
+
+def encode_federated_cursor(cursors: Dict[str, Optional[str]], turn: int = 0) -> Optional[str]:
+    return encode_cursor_map(cursors, turn)
+
+
+def decode_federated_cursor(cursor: str) -> Tuple[Dict[str, Optional[str]], int]:
+    return decode_cursor_map(cursor, FEDERATED_SOURCES)
+
+
+async def search_source_with_deadline(source: str, q: str, per_page: int, cursor: str) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    started = time.monotonic()
+    try:
+        data = await asyncio.wait_for(search_works(source, q, per_page, cursor), timeout=FEDERATED_TIMEOUT)
+        status: Dict[str, Any] = {"status": "ok", "count": (data.get("meta") or {}).get("count", 0)}
+    except asyncio.TimeoutError:
+        data, status = {}, {"status": "timeout", "error": f"No response within {FEDERATED_TIMEOUT:g}s"}
+    except Exception as e:
+        data, status = {}, {"status": "error", "error": str(e)}
+    status["per_page"] = per_page
+    status["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return source, data, status
+
+
+class FederatedMerge:
+    """Accumulates per-source pages into one deduped, OA-first result set."""
+
+    def __init__(self, cursors: Dict[str, Optional[str]], turn: int = 0):
+        self.cursors = dict(cursors)
+        self.turn = turn
+        self.seen: set = set()
+        self.statuses: Dict[str, Dict[str, Any]] = {}
+        self.count = 0
+
+    def add(self, source: str, data: Dict[str, Any], status: Dict[str, Any]) -> List[Work]:
+        self.statuses[source] = status
+        if status["status"] != "ok":
+            # Keep the old position so the next page retries this source
+            return []
+        meta = data.get("meta") or {}
+        self.count += meta.get("count") or 0
+        self.cursors[source] = meta.get("next_cursor")
+        fresh = []
+        for w in data.get("results") or []:
+            key = work_dedupe_key(w)
+            if key and key in self.seen:
+                continue
+            if key:
+                self.seen.add(key)
+            fresh.append(w)
+        return fresh
+
+    def skip(self, source: str) -> None:
+        self.statuses[source] = {"status": "exhausted"}
+
+    def defer(self, source: str) -> None:
+        # No share of this page (per_page < active sources); its turn comes on a later page
+        self.statuses[source] = {"status": "deferred", "per_page": 0}
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "next_cursor": encode_federated_cursor(self.cursors, self.turn),
+            "sources": self.statuses,
+        }
+
+
+def federated_tasks(merge: FederatedMerge, q: str, per_page: int) -> List["asyncio.Task"]:
+    active = []
+    for src in FEDERATED_SOURCES:
+        if merge.cursors.get(src) is None:
+            merge.skip(src)
+        else:
+            active.append(src)
+    sizes, merge.turn = page_shares(per_page, active, merge.turn)
+    queried = []
+    for src in active:
+        if sizes[src]:
+            queried.append(src)
+        else:
+            merge.defer(src)
+    return [asyncio.ensure_future(search_source_with_deadline(src, q, sizes[src], merge.cursors[src])) for src in queried]
+
+
+async def search_federated(q: str, per_page: int, cursor: str) -> Dict[str, Any]:
+    merge = FederatedMerge(*decode_federated_cursor(cursor))
+    done = await asyncio.gather(*federated_tasks(merge, q, per_page))
+    by_source = {src: merge.add(src, data, status) for src, data, status in done}
+    # Interleave by rank so the stable OA-first sort keeps each source's relevance order
+    results: List[Work] = []
+    for rank in range(max((len(items) for items in by_source.values()), default=0)):
+        for src in FEDERATED_SOURCES:
+            items = by_source.get(src) or []
+            if rank < len(items):
+                results.append(items[rank])
+    data = sort_oa_first(source="all", entity="works", data={"results": results})
+    data["meta"] = merge.meta()
+    return data
+
+
+async def stream_federated(q: str, per_page: int, cursor: str, fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+    # NDJSON: one line per source as it finishes, then a final line with the combined meta
+    merge = FederatedMerge(*decode_federated_cursor(cursor))
+    for fut in asyncio.as_completed(federated_tasks(merge, q, per_page)):
+        src, data, status = await fut
+        chunk = sort_oa_first(source="all", entity="works", data={"results": merge.add(src, data, status)})
+        with stage("serialize"):
+            line = json_dumps({"source": src, "status": status, **page_to_dict(chunk, fields)}) + b"\n"
+        yield line
+    yield json_dumps({"meta": merge.meta()}) + b"\n"
+
+
+# Largest page each upstream accepts; bulk export always walks at these sizes
+EXPORT_PAGE_SIZE = {"openalex": 200, "crossref": 1000, "arxiv": 1000}
+EXPORT_COLUMNS = ["query", "title", "skills", "source_engine", "doi", "publication_year", "publisher_or_author", "link"]
+
+
+def map_work_for_export(w: Work, query: str) -> Dict[str, Any]:
+    # Same columns as mapWorkForExport in web/src/App.tsx
+    return {
+        "query": query or "",
+        "title": w.title,
+        "skills": w.skills[:5],
+        "source_engine": w.venue,
+        "doi": w.doi,
+        "publication_year": w.year,
+        "publisher_or_author": w.publisher or (w.authors[0] if w.authors else ""),
+        "link": w.link or w.pdf or w.id,
+    }
+
+
+def encode_export_checkpoint(source: str, q: str, cursor: str, exported: int) -> str:
+    raw = json.dumps({"source": source, "q": q, "cursor": cursor, "exported": exported}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_export_checkpoint(token: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if data["source"] not in EXPORT_PAGE_SIZE or not isinstance(data["cursor"], str):
+            raise ValueError(data["source"])
+        return {"source": data["source"], "q": str(data.get("q") or ""), "cursor": data["cursor"], "exported": int(data.get("exported") or 0)}
+    except Exception:
+        raise ValueError(f"Invalid export checkpoint: {token!r}")
+
+
+async def fetch_export_page(source: str, q: str, cursor: str) -> Dict[str, Any]:
+    per_page = EXPORT_PAGE_SIZE[source]
+    if source == "crossref":
+        return await search_crossref(q, per_page, cursor, deep_paging=True)
+    if source == "arxiv":
+        return await search_arxiv(q, per_page, cursor)
+    return await search_openalex_works(q, per_page, cursor)
+
+
+async def iter_export_pages(source: str, q: str, cursor: str) -> AsyncIterator[Tuple[List[Work], Optional[str]]]:
+    # Exports and harvests queue behind interactive searches
+    request_priority.set(BULK)
+    parts = compile_plan(source, q)
+    # A split plan walks its parts one after another; its cursor is "<part>:<upstream cursor>"
+    part = 0
+    if len(parts) > 1 and ":" in cursor:
+        head, cursor = cursor.split(":", 1)
+        part = min(int(head), len(parts) - 1)
+    # Dedupe across parts needs every key seen so far (small next to the rows themselves)
+    seen: Optional[set] = set() if len(parts) > 1 else None
+    # Page N+1 is already in flight while the caller serializes page N
+    pending = asyncio.ensure_future(fetch_export_page(source, parts[part], cursor))
+    try:
+        while pending is not None:
+            data = await pending
+            next_cursor = (data.get("meta") or {}).get("next_cursor")
+            results = data.get("results") or []
+            if not (next_cursor and results):
+                part, next_cursor = part + 1, "*"
+                if part >= len(parts):
+                    next_cursor = None
+            pending = asyncio.ensure_future(fetch_export_page(source, parts[part], next_cursor)) if next_cursor else None
+            if seen is not None:
+                fresh = []
+                for w in results:
+                    key = work_dedupe_key(w)
+                    if key and key in seen:
+                        continue
+                    if key:
+                        seen.add(key)
+                    fresh.append(w)
+                results = fresh
+            yield results, (f"{part}:{next_cursor}" if next_cursor and len(parts) > 1 else next_cursor)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def stream_export(source: str, q: str, cursor: str, exported: int, fmt: str, limit: int, checkpoints: bool) -> AsyncIterator[bytes]:
+    columns = EXPORT_COLUMNS + (["checkpoint"] if checkpoints else [])
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(columns)
+        yield buf.getvalue().encode()
+    start = exported
+    resume_cursor = cursor
+    try:
+        async for results, next_cursor in iter_export_pages(source, q, cursor):
+            if limit:
+                results = results[: max(0, limit - (exported - start))]
+            exported += len(results)
+            resume_cursor = next_cursor
+            done = not next_cursor or (limit and exported - start >= limit)
+            # A limit cut mid-page can't be resumed exactly, so the last page gets no checkpoint
+            checkpoint = None if done else encode_export_checkpoint(source, q, next_cursor, exported)
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf, lineterminator="\n")
+                for i, w in enumerate(results):
+                    row = map_work_for_export(w, q)
+                    row["skills"] = "; ".join(row["skills"])
+                    if checkpoints:
+                        row["checkpoint"] = checkpoint if i == len(results) - 1 else ""
+                    writer.writerow(["" if row[c] is None else row[c] for c in columns])
+                yield buf.getvalue().encode()
+            else:
+                lines = [json_dumps(map_work_for_export(w, q)) for w in results]
+                lines.append(json_dumps({"checkpoint": checkpoint, "exported": exported}))
+                yield b"\n".join(lines) + b"\n"
+            if done:
+                break
+    except Exception as e:
+        # Headers are already sent: NDJSON ends with an error line saying where to resume,
+        # CSV aborts the chunked response so the truncation is visible to the client
+        if fmt != "ndjson":
+            raise
+        checkpoint = encode_export_checkpoint(source, q, resume_cursor, exported)
+        yield json_dumps({"error": str(e), "checkpoint": checkpoint, "exported": exported}) + b"\n"
+
+
+def build_query(q: str, keyset: str) -> str:
+    """AND the keywords.md categories named in `keyset` ("all" or comma-separated) onto q."""
+    q = (q or "").strip()
+    if keyset:
+        names = None if keyset.strip().lower() == "all" else [n.strip() for n in keyset.split(",") if n.strip()]
+        keywords = keyword_set_query(names)
+        if q and parse_query(q) is None:
+            # Free text joins the keyword set as a term; stray quotes or brackets would break the grammar
+            q = " ".join(re.sub(r'[()"]', " ", q).split())
+        q = f"{keywords} AND ({q})" if q else keywords
+    compile_plan("openalex", q)  # surface syntax errors before any upstream call
+    return q
+
+
+class CompactJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        with stage("serialize"):
+            return json_dumps(content)
+
+
 @app.get("/")
 def root():
     # Redirect to /public/ for local usage
@@ -160,35 +784,149 @@ def root():
 
 
 @app.get("/api/search")
-def api_search(
-    source: str = Query("openalex", enum=["openalex", "crossref", "arxiv"]),
+async def api_search(
+    source: str = Query("openalex", enum=["openalex", "crossref", "arxiv", "all", "local"]),
     entity: str = Query("works"),
     q: str = Query(""),
     per_page: int = Query(10, ge=1, le=200),
     cursor: str = Query("*"),
+    stream: bool = Query(False, description="source=all only: stream NDJSON as each source finishes"),
+    fields: str = Query("", description="Comma-separated record fields to return (default: all)"),
+    keyset: str = Query("", description="keywords.md categories to AND with q: 'all' or comma-separated names"),
 ):
+    try:
+        projection = parse_fields(fields, AUTHOR_FIELDS if entity == "authors" else WORK_FIELDS)
+        if entity != "authors":
+            q = build_query(q, keyset)
+            check_cursor(source, q, cursor)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     try:
         if entity == "authors":
             # Only OpenAlex supports authors in our API
-            if source != "openalex":
+            if source not in ("openalex", "all"):
                 return JSONResponse({"results": [], "meta": {"count": 0, "next_cursor": None}})
-            data = search_openalex_authors(q, per_page, cursor)
+            data = await search_authors(q, per_page, cursor)
+        elif source == "all":
+            if stream:
+                return StreamingResponse(stream_federated(q, per_page, cursor, projection), media_type="application/x-ndjson")
+            data = await search_federated(q, per_page, cursor)
         else:  # works
-            if source == "crossref":
-                data = search_crossref(q, per_page, cursor)
-            elif source == "arxiv":
-                data = search_arxiv(q, per_page, cursor)
-            else:
-                data = search_openalex_works(q, per_page, cursor)
+            data = await search_works(source, q, per_page, cursor)
         # OA-first ordering for works across sources
         data = sort_oa_first(source=source, entity=entity, data=data)
-        return JSONResponse(data)
-    except requests.HTTPError as e:
+        with stage("serialize"):
+            content = page_to_dict(data, projection)
+        return CompactJSONResponse(content)
+    except LocalIndexUnavailable as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except UpstreamUnavailable as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except httpx.HTTPStatusError as e:
         return JSONResponse({"error": str(e), "details": getattr(e.response, "text", "")}, status_code=502)
+    except AtomParseError as e:
+        return JSONResponse({"error": str(e)}, status_code=502)
+    except httpx.TimeoutException as e:
+        return JSONResponse({"error": f"Upstream timeout: {e!r}"}, status_code=504)
+    except httpx.TransportError as e:
+        return JSONResponse({"error": f"Upstream unreachable: {e!r}"}, status_code=502)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+@app.get("/api/export")
+async def api_export(
+    source: str = Query("openalex", enum=["openalex", "crossref", "arxiv"]),
+    q: str = Query(""),
+    format: str = Query("csv", enum=["csv", "ndjson"]),
+    checkpoint: str = Query("", description="Resume token from a previous export"),
+    limit: int = Query(0, ge=0, description="Stop after this many works (0 = everything)"),
+    checkpoints: bool = Query(False, description="CSV only: add a checkpoint column at each page boundary"),
+    keyset: str = Query("", description="keywords.md categories to AND with q: 'all' or comma-separated names"),
+):
+    try:
+        if checkpoint:
+            state = decode_export_checkpoint(checkpoint)
+        else:
+            state = {"source": source, "q": build_query(q, keyset), "cursor": "*", "exported": 0}
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"{state['source']}-works-export.{format}"
+    return StreamingResponse(
+        stream_export(state["source"], state["q"], state["cursor"], state["exported"], format, limit, checkpoints),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/query/plan")
+def api_query_plan(q: str = Query(""), keyset: str = Query("")):
+    """Show the native per-source queries a boolean query or keyword set compiles to."""
+    try:
+        query = build_query(q, keyset)
+        plans = {src: list(compile_plan(src, query)) for src in FEDERATED_SOURCES}
+        node = parse_query(query)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    warnings = []
+    stems = unexpanded_wildcards(node) if node is not None else []
+    if stems:
+        warnings.append(
+            "OpenAlex and Crossref have no wildcards, so these terms are sent as whole words (OpenAlex also "
+            f"matches their inflections): {', '.join(stems)}. A truncated stem that is not a word, like "
+            "Competenc*, matches nothing there unless its word forms are listed under Wildcard Expansions in keywords.md."
+        )
+    return JSONResponse({"query": query, "plans": plans, "warnings": warnings, "categories": list(load_keyword_categories())})
+
+
+@app.get("/api/local/stats")
+async def api_local_stats():
+    if local_index is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, "auto_ingest": LOCAL_INDEX_AUTO_INGEST, **await asyncio.to_thread(local_index.stats)})
+
+
+@app.get("/api/scheduler/stats")
+def api_scheduler_stats():
+    if upstream_scheduler is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, "sources": upstream_scheduler.snapshot()})
+
+
+@app.get("/api/cache/stats")
+def api_cache_stats():
+    if search_cache is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **search_cache.snapshot()})
+
+
+def collect_component_metrics():
+    # Cache and scheduler counters, read at scrape time
+    if search_cache is not None:
+        snap = search_cache.snapshot()
+        for event in ("hits", "stale_hits", "misses", "coalesced", "evictions", "refreshes", "errors"):
+            yield "ai_search_cache_events_total", "counter", "Search cache events", {"event": event}, snap[event]
+        yield "ai_search_cache_bytes", "gauge", "Approximate bytes held by the in-memory cache", {}, snap["bytes"]
+    if upstream_scheduler is not None:
+        for host in upstream_scheduler.hosts.values():
+            snap = host.snapshot()
+            for event in ("requests", "retries", "throttled", "failures", "rejected"):
+                yield "ai_search_upstream_events_total", "counter", "Upstream calls by outcome", {"source": host.name, "event": event}, snap[event]
+            yield "ai_search_upstream_queue_depth", "gauge", "Calls waiting for a rate-limit slot", {"source": host.name}, snap["queue_depth"]
+            yield "ai_search_upstream_in_flight", "gauge", "Calls currently in flight", {"source": host.name}, snap["in_flight"]
+            yield "ai_search_upstream_circuit_open", "gauge", "1 while the circuit breaker rejects calls", {"source": host.name}, int(snap["circuit"] == "open")
+
+
+metrics.add_collector(collect_component_metrics)
+
+
+@app.get("/metrics")
+def api_metrics():
+    """Prometheus text format. Counters are per worker; scrape each worker or run a single one."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     # Local dev: uvicorn app:app --reload
     import uvicorn
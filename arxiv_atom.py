@@ -0,0 +1,131 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import Optional, Dict, Any, List, Tuple
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+ARXIV = "{http://arxiv.org/schemas/atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+
+_ENTRY, _ID, _TITLE, _PUBLISHED = ATOM + "entry", ATOM + "id", ATOM + "title", ATOM + "published"
+_LINK, _AUTHOR, _NAME, _CATEGORY = ATOM + "link", ATOM + "author", ATOM + "name", ATOM + "category"
+_DOI, _TOTAL = ARXIV + "doi", OPENSEARCH + "totalResults"
+_HTML_TYPES = {"text/html", "html", "application/xhtml+xml", "xhtml"}
+
+
+class AtomParseError(ValueError):
+    pass
+
+
+def _text(elem: ET.Element) -> str:
+    text = (elem.text or "").strip()
+    if not text.isascii():
+        # feedparser "repairs" UTF-8 that was decoded as Latin-1; kept so results don't change
+        try:
+            text = text.encode("iso-8859-1").decode("utf-8")
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return text
+
+
+def _entry(elem: ET.Element) -> Dict[str, Any]:
+    """Fields of one <entry>, with the same defaults and precedence feedparser applies."""
+    entry_id: Optional[str] = None
+    link: Optional[str] = None
+    title = published = doi = ""
+    pdf: Optional[str] = ""
+    pdf_found = False
+    authors: List[Optional[str]] = []
+    tags: List[tuple] = []
+    for child in elem:
+        tag = child.tag
+        if tag == _LINK:
+            attrib = child.attrib
+            href = attrib.get("href")
+            rel = attrib.get("rel", "alternate").lower()
+            kind = attrib.get("type", "text/html").lower()
+            if not pdf_found and (kind == "application/pdf" or attrib.get("title") == "pdf"):
+                pdf, pdf_found = href, True
+            if href is None:
+                # feedparser takes an href-less link's text as the link, unescaping query strings
+                link = re.sub(r"&([A-Za-z0-9_]+);", r"&\g<1>", (child.text or "").strip().replace("&amp;", "&"))
+            elif rel == "alternate" and kind in _HTML_TYPES:
+                # A link with no rel is an alternate; the last HTML alternate wins
+                link = href
+        elif tag == _AUTHOR:
+            name = child.find(_NAME)
+            authors.append((name.text or "").strip() if name is not None else None)
+        elif tag == _CATEGORY:
+            attrib = child.attrib
+            tag_key = (attrib.get("term"), attrib.get("scheme", attrib.get("domain")), attrib.get("label"))
+            if any(tag_key) and tag_key not in tags:
+                tags.append(tag_key)
+        elif tag == _ID:
+            entry_id = _text(child)
+        elif tag == _TITLE:
+            title = _text(child)
+        elif tag == _PUBLISHED:
+            published = _text(child)
+        elif tag == _DOI:
+            doi = _text(child)
+    if link is None:
+        # An Atom id doubles as the link when there is no alternate link
+        link = entry_id or ""
+    return {
+        "id": entry_id or link,
+        "title": title,
+        "link": link,
+        "pdf": pdf,
+        "published": published,
+        "doi": doi,
+        "authors": authors,
+        "categories": [t[0] for t in tags],
+    }
+
+
+class ArxivFeedParser:
+    """Incremental parser for arXiv API Atom pages.
+
+    feed() takes body chunks as they arrive and returns the entries they completed; each entry
+    is dropped from the tree once read, so memory stays flat however large the page.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.total: Optional[int] = None
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        try:
+            self._parser.feed(data)
+            # XMLPullParser hands parse errors back through read_events(), so drain inside the try
+            return self._drain()
+        except ET.ParseError as e:
+            raise AtomParseError(f"Malformed arXiv Atom feed: {e}") from None
+
+    def close(self) -> List[Dict[str, Any]]:
+        try:
+            self._parser.close()
+            return self._drain()
+        except ET.ParseError as e:
+            raise AtomParseError(f"Malformed arXiv Atom feed: {e}") from None
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        entries = []
+        for _, elem in self._parser.read_events():
+            tag = elem.tag
+            if tag == _ENTRY:
+                entries.append(_entry(elem))
+                elem.clear()
+            elif tag == _TOTAL:
+                try:
+                    self.total = int(elem.text or "")
+                except ValueError:
+                    self.total = None
+        return entries
+
+
+def parse_feed(content: bytes) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """(entries, opensearch total) for a whole page already in memory."""
+    parser = ArxivFeedParser()
+    entries = parser.feed(content)
+    entries += parser.close()
+    return entries, parser.total
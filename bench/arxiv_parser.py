@@ -0,0 +1,146 @@
+"""Check the streaming arXiv parser against feedparser on the fixture corpus, then time both.
+
+    python -m bench.arxiv_parser                  # corpus check + 200/1000-entry pages
+    python -m bench.arxiv_parser --sizes 50,2000 --repeat 20
+
+Exits 1 if any fixture parses differently, so it can gate CI.
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tracemalloc
+from typing import Optional, List, Tuple, Callable
+
+import feedparser
+
+from app import is_oa_arxiv_item, work_from_arxiv
+from arxiv_atom import ArxivFeedParser, parse_feed
+from bench.fake_upstream import FIXTURES_DIR, Behaviour, FixturePages
+from models import Work
+
+
+def feedparser_works(content: bytes) -> Tuple[List[Work], Optional[int]]:
+    """The feedparser-based path search_arxiv used before arxiv_atom, kept as the reference
+    (nameless authors become "" and term-less categories are dropped, as in work_from_arxiv)."""
+    feed = feedparser.parse(content)
+    total = feed.feed.get("opensearch_totalresults")
+    try:
+        total_i = int(total) if total is not None else None
+    except Exception:
+        total_i = None
+    results = []
+    for e in feed.entries:
+        title = getattr(e, "title", "")
+        link = getattr(e, "link", "")
+        pdf = ""
+        for l in getattr(e, "links", []) or []:
+            if l.get("type") == "application/pdf" or l.get("title") == "pdf":
+                pdf = l.get("href")
+                break
+        year = None
+        if getattr(e, "published", ""):
+            try:
+                year = int(e.published[:4])
+            except Exception:
+                year = None
+        doi = getattr(e, "arxiv_doi", None) or ""
+        authors = [a.get("name") or "" for a in getattr(e, "authors", []) or []]
+        categories = [t.get("term") for t in getattr(e, "tags", []) or [] if t.get("term")]
+        results.append(Work(
+            id=getattr(e, "id", "") or link,
+            source="arxiv",
+            title=title,
+            year=year,
+            venue="arXiv",
+            doi=doi,
+            link=link,
+            pdf=pdf,
+            is_oa=is_oa_arxiv_item({"pdf": pdf, "link": link}),
+            authors=authors,
+            skills=categories,
+        ))
+    return results, total_i
+
+
+def streaming_works(content: bytes, chunk_size: int = 0) -> Tuple[List[Work], Optional[int]]:
+    if not chunk_size:
+        entries, total = parse_feed(content)
+        return [work_from_arxiv(e) for e in entries], total
+    # Same body fed in pieces, the way search_arxiv receives it from the network
+    parser = ArxivFeedParser()
+    results: List[Work] = []
+    for i in range(0, len(content), chunk_size):
+        results.extend(work_from_arxiv(e) for e in parser.feed(content[i:i + chunk_size]))
+    results.extend(work_from_arxiv(e) for e in parser.close())
+    return results, parser.total
+
+
+def check_corpus(paths: List[str]) -> int:
+    mismatches = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        expected = feedparser_works(content)
+        for chunk_size in (0, 1, 7, 4096):
+            got = streaming_works(content, chunk_size)
+            if got != expected:
+                mismatches += 1
+                print(f"MISMATCH {os.path.basename(path)} (chunk size {chunk_size or 'whole'})", file=sys.stderr)
+                if got[1] != expected[1]:
+                    print(f"  total: {got[1]!r} != {expected[1]!r}", file=sys.stderr)
+                for i, (a, b) in enumerate(zip(got[0], expected[0])):
+                    if a != b:
+                        print(f"  entry {i}:\n    got      {a!r}\n    expected {b!r}", file=sys.stderr)
+                if len(got[0]) != len(expected[0]):
+                    print(f"  {len(got[0])} entries != {len(expected[0])}", file=sys.stderr)
+                break
+        else:
+            print(f"ok  {os.path.basename(path)}: {len(expected[0])} entries, total={expected[1]}")
+    return mismatches
+
+
+def measure(parse: Callable[[bytes], object], content: bytes, repeat: int) -> Tuple[float, float]:
+    """(best ms per page, peak traced MiB)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(content)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    parse(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000, peak / (1024 * 1024)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.arxiv_parser", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES_DIR, "arxiv_*.xml"), help="Glob of Atom fixtures to compare")
+    parser.add_argument("--sizes", default="200,1000", help="Entries per synthetic page to time")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--pad-bytes", type=int, default=1000, help="Extra abstract bytes per entry")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(args.corpus))
+    if not paths:
+        print(f"No fixtures match {args.corpus}", file=sys.stderr)
+        return 1
+    mismatches = check_corpus(paths)
+
+    pages = FixturePages("arxiv", Behaviour(0, 0, 0, 503, args.pad_bytes, total=10 ** 6))
+    print(f"\n{'entries':>8} {'KiB':>8} {'feedparser ms':>14} {'streaming ms':>13} {'speedup':>8} {'peak MiB (fp/stream)':>22}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        content = pages.page(0, size)
+        if streaming_works(content, 64 * 1024) != feedparser_works(content):
+            print(f"MISMATCH synthetic {size}-entry page", file=sys.stderr)
+            mismatches += 1
+        fp_ms, fp_mem = measure(feedparser_works, content, args.repeat)
+        st_ms, st_mem = measure(lambda c: streaming_works(c, 64 * 1024), content, args.repeat)
+        print(f"{size:>8} {len(content) / 1024:>8.0f} {fp_ms:>14.1f} {st_ms:>13.1f} {fp_ms / st_ms:>7.1f}x {fp_mem:>10.1f} / {st_mem:<9.1f}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Local stand-in for OpenAlex, Crossref and arXiv that replays the recorded fixtures in bench/fixtures.
+
+Each source listens on its own port (base, base+1, base+2) so the app's per-host scheduler
+treats them as separate upstreams:
+
+    python -m bench.fake_upstream --port 9100 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+    OPENALEX_BASE_URL=http://127.0.0.1:9100 CROSSREF_BASE_URL=http://127.0.0.1:9101 \\
+        ARXIV_BASE_URL=http://127.0.0.1:9102 uvicorn app:app
+
+Pages are built by cycling the fixture records (with unique ids/DOIs after the first pass) up to
+the requested page size, so payload size follows per_page; --pad-bytes inflates every record.
+"""
+import os
+import re
+import copy
+import json
+import random
+import asyncio
+import argparse
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SOURCES = ("openalex", "crossref", "arxiv")
+FIXTURE_FILES = {"openalex": "openalex_works.json", "crossref": "crossref_works.json", "arxiv": "arxiv_query.xml"}
+LIVE_URLS = {
+    "openalex": "https://api.openalex.org/works?{}",
+    "crossref": "https://api.crossref.org/works?{}",
+    "arxiv": "https://export.arxiv.org/api/query?{}",
+}
+
+
+def per_source(value: str, cast=float) -> Dict[str, Any]:
+    """"80" applies to every source; "openalex=50,arxiv=400" sets them one by one (others 0)."""
+    if "=" not in value:
+        return {s: cast(value) for s in SOURCES}
+    parsed = {s: cast(0) for s in SOURCES}
+    for part in value.split(","):
+        name, _, v = part.partition("=")
+        if name.strip() not in parsed:
+            raise argparse.ArgumentTypeError(f"Unknown source: {name}")
+        parsed[name.strip()] = cast(v)
+    return parsed
+
+
+class Behaviour:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, error_status: int, pad_bytes: int, total: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.pad_bytes = pad_bytes
+        self.total = total
+
+
+class FixturePages:
+    """Builds (and memoizes) encoded pages for one source; the query itself is ignored."""
+
+    def __init__(self, source: str, behaviour: Behaviour):
+        self.source = source
+        self.behaviour = behaviour
+        path = os.path.join(FIXTURES_DIR, FIXTURE_FILES[source])
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+        if source == "arxiv":
+            first, last = raw.index("<entry>"), raw.rindex("</entry>") + len("</entry>")
+            self.head, self.tail = raw[:first], raw[last:]
+            self.records: List[Any] = re.findall(r"<entry>.*?</entry>", raw[first:last], re.S)
+        else:
+            data = json.loads(raw)
+            self.records = data["results"] if source == "openalex" else data["message"]["items"]
+        self._pages: Dict[Tuple[int, int], bytes] = {}
+
+    def record(self, n: int) -> Any:
+        rec = self.records[n % len(self.records)]
+        cycle = n // len(self.records)
+        pad = "lorem ipsum " * (self.behaviour.pad_bytes // 12)
+        if self.source == "arxiv":
+            if cycle:
+                # Distinct id, title and DOI so the app's dedupe keeps every record
+                rec = re.sub(r"(<id>[^<]*|<title>[^<]*|<arxiv:doi[^>]*>[^<]*)", rf"\g<1>.{cycle}", rec)
+            return rec.replace("</summary>", pad + "</summary>") if pad else rec
+        rec = copy.deepcopy(rec)
+        if cycle:
+            rec["DOI" if self.source == "crossref" else "doi"] += f".{cycle}"
+            if self.source == "openalex":
+                rec["id"] += f"-{cycle}"
+                rec["display_name"] = rec["title"] = f"{rec['title']} ({cycle})"
+            else:
+                rec["title"] = [f"{rec['title'][0]} ({cycle})"]
+        if pad:
+            rec["abstract" if self.source == "crossref" else "x_padding"] = pad
+        return rec
+
+    def page(self, offset: int, size: int) -> bytes:
+        key = (offset, size)
+        if key not in self._pages:
+            if len(self._pages) > 512:
+                self._pages.clear()
+            self._pages[key] = self._build(offset, size)
+        return self._pages[key]
+
+    def _build(self, offset: int, size: int) -> bytes:
+        total = self.behaviour.total
+        records = [self.record(n) for n in range(offset, min(total, offset + size))]
+        end = offset + len(records)
+        if self.source == "arxiv":
+            head = re.sub(r"(<opensearch:totalResults[^>]*>)\d+", rf"\g<1>{total}", self.head)
+            head = re.sub(r"(<opensearch:startIndex[^>]*>)\d+", rf"\g<1>{offset}", head)
+            head = re.sub(r"(<opensearch:itemsPerPage[^>]*>)\d+", rf"\g<1>{size}", head)
+            return (head + "\n  ".join(records) + self.tail).encode("utf-8")
+        if self.source == "openalex":
+            body = {"meta": {"count": total, "per_page": size, "next_cursor": str(end) if end < total else None}, "results": records}
+        else:
+            body = {"status": "ok", "message-type": "work-list",
+                    "message": {"total-results": total, "items": records, "items-per-page": size, "next-cursor": str(end)}}
+        return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def page_params(source: str, params: Dict[str, str]) -> Tuple[int, int]:
+    """(offset, page size) from each API's own paging parameters."""
+    def number(name: str, default: int) -> int:
+        try:
+            return max(0, int(params.get(name, default)))
+        except ValueError:
+            return default
+
+    if source == "openalex":
+        cursor = params.get("cursor", "*")
+        return (0 if cursor in ("", "*") else number("cursor", 0)), min(200, number("per_page", 25))
+    if source == "crossref":
+        cursor = params.get("cursor")
+        offset = (0 if cursor in ("", "*") else number("cursor", 0)) if cursor is not None else number("offset", 0)
+        return offset, min(1000, number("rows", 20))
+    return number("start", 0), min(2000, number("max_results", 10))
+
+
+def make_app(source: str, behaviour: Behaviour):
+    pages = FixturePages(source, behaviour)
+    content_type = b"application/atom+xml; charset=utf-8" if source == "arxiv" else b"application/json"
+
+    async def app(scope, receive, send):
+        delay = behaviour.latency_ms + random.uniform(-behaviour.jitter_ms, behaviour.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < behaviour.error_rate:
+            status, body = behaviour.error_status, b'{"error":"injected failure"}'
+            headers = [(b"content-type", b"application/json")]
+            if status in (429, 503):
+                headers.append((b"retry-after", b"1"))
+        else:
+            params = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+            status, body = 200, pages.page(*page_params(source, params))
+            headers = [(b"content-type", content_type)]
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def serve(host: str, port: int, behaviours: Dict[str, Behaviour]) -> None:
+    import uvicorn
+
+    servers = []
+    for i, source in enumerate(SOURCES):
+        config = uvicorn.Config(make_app(source, behaviours[source]), host=host, port=port + i,
+                                log_level="warning", access_log=False, lifespan="off")
+        servers.append(uvicorn.Server(config))
+    print(
+        f"OPENALEX_BASE_URL=http://{host}:{port} CROSSREF_BASE_URL=http://{host}:{port + 1}"
+        f" ARXIV_BASE_URL=http://{host}:{port + 2}",
+        flush=True,
+    )
+    await asyncio.gather(*(s.serve() for s in servers))
+
+
+def record(q: str, rows: int) -> None:
+    """Refresh the fixtures from the live APIs (needs network access)."""
+    from urllib.parse import urlencode
+    import httpx
+
+    params = {
+        "openalex": {"search": q, "per_page": rows},
+        "crossref": {"query": q, "rows": rows},
+        "arxiv": {"search_query": f"all:{q}", "start": 0, "max_results": rows},
+    }
+    headers = {"User-Agent": os.environ.get("HTTP_USER_AGENT", "ai-search-bench/0.1 (+https://localhost)")}
+    with httpx.Client(headers=headers, timeout=60, follow_redirects=True) as client:
+        for source in SOURCES:
+            resp = client.get(LIVE_URLS[source].format(urlencode(params[source])))
+            resp.raise_for_status()
+            with open(os.path.join(FIXTURES_DIR, FIXTURE_FILES[source]), "wb") as f:
+                f.write(resp.content)
+            print(f"{source}: {len(resp.content)} bytes", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.fake_upstream", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100, help="OpenAlex port; Crossref and arXiv use the next two")
+    parser.add_argument("--latency-ms", default="50", help='Added latency per response: "80" or "openalex=40,crossref=120,arxiv=400"')
+    parser.add_argument("--jitter-ms", default="0", help="Uniform +/- jitter on the latency (same syntax)")
+    parser.add_argument("--error-rate", default="0", help="Fraction of requests that fail (same syntax)")
+    parser.add_argument("--error-status", type=int, default=503, help="Status for injected failures (429/503 add Retry-After: 1)")
+    parser.add_argument("--pad-bytes", type=int, default=0, help="Extra bytes of abstract text per record")
+    parser.add_argument("--total", type=int, default=1000, help="Result count every query reports (bounds exports)")
+    parser.add_argument("--record", metavar="QUERY", help="Re-record the fixtures from the live APIs instead of serving")
+    parser.add_argument("--record-rows", type=int, default=25)
+    args = parser.parse_args(argv)
+    if args.record:
+        record(args.record, args.record_rows)
+        return
+    latency, jitter, errors = per_source(args.latency_ms), per_source(args.jitter_ms), per_source(args.error_rate)
+    behaviours = {
+        s: Behaviour(latency[s], jitter[s], errors[s], args.error_status, args.pad_bytes, args.total) for s in SOURCES
+    }
+    try:
+        asyncio.run(serve(args.host, args.port, behaviours))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
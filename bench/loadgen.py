@@ -0,0 +1,177 @@
+"""Closed-loop load generator for /api/search: N concurrent clients for a fixed time or request count.
+
+    python -m bench.loadgen --url http://127.0.0.1:8000 --concurrency 32 --duration 30 --unique
+
+Reports throughput, p50/p95/p99 latency, status counts and the server's per-stage breakdown
+(from its Server-Timing header). --max-p95-ms / --max-error-rate exit non-zero for CI gates.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, parse_qsl
+from typing import Optional, Dict, Any, List
+
+import httpx
+
+# Default request mix: one query per upstream plus federated and boolean searches
+DEFAULT_MIX = [
+    "source=openalex&q=autonomous ship",
+    "source=crossref&q=autonomous ship",
+    "source=arxiv&q=autonomous ship",
+    "source=all&q=seafarer training",
+    "source=openalex&q=(Autonomous Ship* OR Crew) AND Training",
+]
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+class Results:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.stages_ms: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(self.statuses.values())
+        errors = sum(n for status, n in self.statuses.items() if status != 200)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value, 1) if value is not None else None
+
+        return {
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / self.elapsed, 1) if self.elapsed else 0.0,
+            "latency_ms": {p: ms(percentile(self.latencies_ms, q)) for p, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+            | {"max": ms(max(self.latencies_ms, default=None))},
+            "status": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda kv: str(kv[0]))},
+            "server_stages_ms": {
+                name: {"mean": ms(sum(v) / len(v)), "p95": ms(percentile(v, 0.95))} for name, v in self.stages_ms.items()
+            },
+        }
+
+
+async def run(
+    url: str,
+    concurrency: int = 16,
+    duration: float = 10.0,
+    requests: int = 0,
+    warmup: float = 0.0,
+    mix: Optional[List[str]] = None,
+    per_page: int = 25,
+    unique: bool = False,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    """Drive `concurrency` clients until `requests` are sent (if set) or `duration` seconds pass."""
+    mix = [dict(parse_qsl(m)) for m in (mix or DEFAULT_MIX)]
+    counter = itertools.count()
+    base = url.rstrip("/") + "/api/search"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        async def one(results: Optional[Results]) -> None:
+            n = next(counter)
+            params = {"per_page": per_page, **random.choice(mix)}
+            if unique:
+                # A distinct query per request defeats the response cache, so every call goes upstream
+                params["q"] = f"{params.get('q', '')} {n}".strip()
+            started = time.perf_counter()
+            try:
+                resp = await client.get(f"{base}?{urlencode(params)}")
+                status: Any = resp.status_code
+                stages = parse_server_timing(resp.headers.get("server-timing", ""))
+            except httpx.HTTPError as e:
+                status, stages = type(e).__name__, {}
+            if results is None:
+                return
+            results.latencies_ms.append((time.perf_counter() - started) * 1000)
+            results.statuses[status] += 1
+            for name, dur in stages.items():
+                results.stages_ms[name].append(dur)
+
+        async def client_loop(results: Optional[Results], deadline: float, budget: List[int]) -> None:
+            while time.perf_counter() < deadline:
+                if budget:
+                    if budget[0] <= 0:
+                        return
+                    budget[0] -= 1
+                await one(results)
+
+        if warmup:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(client_loop(None, deadline, []) for _ in range(concurrency)))
+        results = Results()
+        deadline = time.perf_counter() + (duration if not requests else 1e9)
+        budget = [requests] if requests else []
+        await asyncio.gather(*(client_loop(results, deadline, budget) for _ in range(concurrency)))
+        results.elapsed = time.perf_counter() - results.started
+    return results.summary()
+
+
+def format_summary(label: str, s: Dict[str, Any]) -> str:
+    lat = s["latency_ms"]
+    stages = "  ".join(f"{name}={v['mean']}" for name, v in s["server_stages_ms"].items())
+    return (
+        f"{label:<14} {s['requests']:>7} req  {s['throughput_rps']:>8} req/s  "
+        f"p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} ms  errors={s['error_rate']:.2%}"
+        + (f"\n{'':<14} server mean ms: {stages}" if stages else "")
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.loadgen", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("-n", "--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unrecorded traffic first")
+    parser.add_argument("--mix", action="append", help='Query string to send, repeatable (e.g. "source=arxiv&q=ship")')
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--unique", action="store_true", help="Make every query distinct to bypass the cache")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit 1 if p95 latency is above this")
+    parser.add_argument("--max-error-rate", type=float, help="Exit 1 if the error rate is above this (0-1)")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(
+        args.url, args.concurrency, args.duration, args.requests, args.warmup, args.mix, args.per_page, args.unique,
+    ))
+    print(json.dumps(summary) if args.json else format_summary("result", summary))
+    failed = []
+    if args.max_p95_ms is not None and (summary["latency_ms"]["p95"] or 0) > args.max_p95_ms:
+        failed.append(f"p95 {summary['latency_ms']['p95']} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and summary["error_rate"] > args.max_error_rate:
+        failed.append(f"error rate {summary['error_rate']} > {args.max_error_rate}")
+    for msg in failed:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Benchmark the app under several server configurations against the fake upstream.
+
+    python -m bench.run_matrix --configs uvicorn:1,uvicorn:4,gunicorn:4 --duration 20 --concurrency 32
+
+Starts bench.fake_upstream once, then for each config starts the app (uvicorn --workers N, or
+gunicorn with N UvicornWorker processes), runs bench.loadgen against it and stops it. Options
+after "--" are passed to the fake upstream, e.g. `-- --latency-ms arxiv=400 --error-rate 0.02`.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Optional, Dict, Any, List
+
+from bench import loadgen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout:g}s")
+
+
+def server_command(server: str, workers: int, port: int) -> List[str]:
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "app:app", "-k", "uvicorn.workers.UvicornWorker",
+                "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+
+
+def app_env(upstream_port: int, cache: bool) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k not in ("LOCAL_INDEX_PATH", "CACHE_SQLITE_PATH")}
+    env.update({
+        "OPENALEX_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+        "CROSSREF_BASE_URL": f"http://127.0.0.1:{upstream_port + 1}",
+        "ARXIV_BASE_URL": f"http://127.0.0.1:{upstream_port + 2}",
+        "CACHE_ENABLED": "1" if cache else "0",
+    })
+    # The fake upstream has no polite-use limits; keep the scheduler on but out of the way
+    for source in ("OPENALEX", "CROSSREF", "ARXIV"):
+        env.setdefault(f"RATE_LIMIT_{source}", "100000")
+        env.setdefault(f"RATE_BURST_{source}", "1000")
+        env.setdefault(f"MAX_CONCURRENCY_{source}", "1000")
+    return env
+
+
+def stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    upstream_args: List[str] = []
+    if "--" in argv:
+        i = argv.index("--")
+        argv, upstream_args = argv[:i], argv[i + 1:]
+    parser = argparse.ArgumentParser(prog="python -m bench.run_matrix", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--configs", default="uvicorn:1,uvicorn:2,gunicorn:2", help="server:workers, comma-separated")
+    parser.add_argument("--port", type=int, default=8100, help="Port for the app under test")
+    parser.add_argument("--upstream-port", type=int, default=9100)
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mix", action="append", help="Query string to send, repeatable (see bench.loadgen)")
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache on (default: off, every call goes upstream)")
+    parser.add_argument("--json", metavar="PATH", help="Also write every summary to this file")
+    args = parser.parse_args(argv)
+
+    configs = []
+    for item in args.configs.split(","):
+        server, _, workers = item.strip().partition(":")
+        if server not in ("uvicorn", "gunicorn"):
+            parser.error(f"Unknown server {server!r} (uvicorn or gunicorn)")
+        configs.append((server, int(workers or 1)))
+
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_upstream", "--port", str(args.upstream_port), *upstream_args],
+        cwd=ROOT, stdout=subprocess.DEVNULL,
+    )
+    summaries: Dict[str, Any] = {}
+    try:
+        for port in range(args.upstream_port, args.upstream_port + 3):
+            wait_for_port(port)
+        for server, workers in configs:
+            label = f"{server}:{workers}"
+            proc = subprocess.Popen(server_command(server, workers, args.port), cwd=ROOT, env=app_env(args.upstream_port, args.cache))
+            try:
+                wait_for_port(args.port)
+                summary = asyncio.run(loadgen.run(
+                    f"http://127.0.0.1:{args.port}", args.concurrency, args.duration, 0, args.warmup,
+                    args.mix, args.per_page, unique=not args.cache,
+                ))
+            finally:
+                stop(proc)
+            summaries[label] = summary
+            print(loadgen.format_summary(label, summary), flush=True)
+    finally:
+        stop(upstream)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration, "results": summaries}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
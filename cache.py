@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class SqliteCacheBackend:
+    """On-disk cache shared by every worker on the host (WAL mode, one row per key)."""
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " fresh_until REAL NOT NULL, stale_until REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, float]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, fresh_until, stale_until FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return row[0], row[1], row[2]
+
+    def set(self, key: str, encoded: bytes, fresh_until: float, stale_until: float) -> int:
+        evicted = 0
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, fresh_until, stale_until) VALUES (?, ?, ?, ?)",
+                (key, encoded, fresh_until, stale_until),
+            )
+            self._writes += 1
+            # Prune occasionally rather than on every write
+            if self._writes % 100 == 0:
+                evicted += conn.execute("DELETE FROM search_cache WHERE stale_until < ?", (time.time(),)).rowcount
+                evicted += conn.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    " SELECT key FROM search_cache ORDER BY stale_until DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+        return evicted
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM search_cache")
+
+
+class SearchCache:
+    """TTL + LRU cache for upstream search pages.
+
+    Bounded by entry count and (approximate, encoded) bytes. Concurrent misses
+    for the same key share one upstream call; entries past their TTL but within the
+    stale window are served immediately while a background task refreshes them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = 300.0,
+        source_ttls: Optional[Dict[str, float]] = None,
+        stale_ttl: float = 600.0,
+        backend: Optional[SqliteCacheBackend] = None,
+        encode: Callable[[Any], bytes] = _json_encode,
+        decode: Callable[[bytes], Any] = json.loads,
+        on_refresh: Optional[Callable[[], None]] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.source_ttls = source_ttls or {}
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        self.encode = encode
+        self.decode = decode
+        self.on_refresh = on_refresh  # runs inside each background refresh task before it loads
+        # key -> (value, size, fresh_until, stale_until)
+        self._entries: "OrderedDict[str, Tuple[Any, int, float, float]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+        self._waiters: Dict[str, int] = {}
+        self._refreshing: set = set()
+        self._tasks: set = set()  # strong refs so background refreshes aren't garbage-collected
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "refreshes": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(source: str, entity: str, q: str, per_page: int, cursor: str) -> str:
+        return json.dumps([source, entity, q, per_page, cursor or "*"], separators=(",", ":"))
+
+    def ttl_for(self, source: str) -> float:
+        return self.source_ttls.get(source, self.default_ttl)
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[3] < time.time():
+                self._drop(key)
+            else:
+                self._entries.move_to_end(key)
+                return entry[0], entry[2], entry[3]
+        return None
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _store_local(self, key: str, value: Any, size: int, fresh_until: float, stale_until: float) -> None:
+        self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, fresh_until, stale_until)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    async def _load(self, source: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # Single-flight: the upstream call runs in its own task that every caller for this key awaits,
+        # so one caller being cancelled (e.g. by a federated deadline) doesn't cancel the others
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._fill(source, key, loader))
+            task.add_done_callback(_retrieve_exception)
+            self._inflight[key] = task
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                # Last caller gave up: stop the upstream call and let the next caller start afresh
+                task.cancel()
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    async def _fill(self, source: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            now = time.time()
+            fresh_until = now + self.ttl_for(source)
+            stale_until = fresh_until + self.stale_ttl
+            encoded = self.encode(value)
+            self._store_local(key, value, len(encoded), fresh_until, stale_until)
+            if self.backend is not None:
+                self.stats["evictions"] += await asyncio.to_thread(self.backend.set, key, encoded, fresh_until, stale_until)
+            return value
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _refresh_in_background(self, source: str, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing or key in self._inflight:
+            return
+        self.stats["refreshes"] += 1
+        self._refreshing.add(key)
+
+        async def refresh() -> None:
+            try:
+                if self.on_refresh is not None:
+                    self.on_refresh()
+                await self._load(source, key, loader)
+            except Exception:
+                pass  # keep serving the stale copy until it expires
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.ensure_future(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_load(self, source: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        found = self._lookup(key)
+        if found is None and self.backend is not None:
+            stored = await asyncio.to_thread(self.backend.get, key)
+            if stored is not None:
+                encoded, fresh_until, stale_until = stored
+                found = self.decode(encoded), fresh_until, stale_until
+                self._store_local(key, found[0], len(encoded), fresh_until, stale_until)
+        if found is not None:
+            value, fresh_until, _ = found
+            if fresh_until >= time.time():
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._refresh_in_background(source, key, loader)
+            return value
+        self.stats["misses"] += 1
+        return await self._load(source, key, loader)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else None,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "inflight": len(self._inflight),
+            "backend": "sqlite" if self.backend is not None else "memory",
+        }
+
+
+def _retrieve_exception(task: "asyncio.Task") -> None:
+    # Mark it retrieved so a failure nobody is left awaiting isn't logged as unhandled
+    if not task.cancelled():
+        task.exception()
+
+
+def cache_from_env(**codec: Callable) -> Optional[SearchCache]:
+    if os.environ.get("CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    sqlite_path = os.environ.get("CACHE_SQLITE_PATH", "")
+    backend = SqliteCacheBackend(sqlite_path, int(os.environ.get("CACHE_SQLITE_MAX_ENTRIES", 50000))) if sqlite_path else None
+    source_ttls = {}
+    for source in ("openalex", "crossref", "arxiv"):
+        ttl = os.environ.get(f"CACHE_TTL_{source.upper()}")
+        if ttl:
+            source_ttls[source] = float(ttl)
+    return SearchCache(
+        max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 1024)),
+        max_bytes=int(os.environ.get("CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        default_ttl=float(os.environ.get("CACHE_TTL", 300)),
+        source_ttls=source_ttls,
+        stale_ttl=float(os.environ.get("CACHE_STALE_TTL", 600)),
+        backend=backend,
+        **codec,
+    )
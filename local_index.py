@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, Iterable
+
+from models import Work, to_dict, json_dumps, json_loads, work_dedupe_key
+
+
+def _join_names(names: Iterable[Optional[str]]) -> str:
+    # Records stored before names were normalized may still hold None
+    return " ".join(n for n in names if n)
+
+
+class LocalIndex:
+    """SQLite FTS5 index of harvested works, ranked OA-first then BM25.
+
+    One row per DOI (or normalized title); re-ingesting a work updates it in place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.latencies_ms: deque = deque(maxlen=1000)
+        self.queries = 0
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS works (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL UNIQUE,
+                    is_oa INTEGER NOT NULL,
+                    record BLOB NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5(
+                    title, authors, skills, venue, tokenize = 'porter unicode61'
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def ingest(self, works: Iterable[Work]) -> int:
+        now = time.time()
+        added = 0
+        # One writer per process; BEGIN IMMEDIATE serializes writers across gunicorn workers
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for w in works:
+                key = work_dedupe_key(w) or f"id:{w.id}"
+                row = conn.execute("SELECT id, is_oa, record FROM works WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    # Keep what the other source knew: OA status and any field it filled in
+                    old = json_loads(row[2])
+                    record = {**old, **{k: v for k, v in to_dict(w).items() if v not in (None, "", [])}}
+                    record["is_oa"] = bool(row[1]) or w.is_oa
+                    conn.execute(
+                        "UPDATE works SET is_oa = ?, record = ?, updated_at = ? WHERE id = ?",
+                        (int(record["is_oa"]), json_dumps(record), now, row[0]),
+                    )
+                    conn.execute("DELETE FROM works_fts WHERE rowid = ?", (row[0],))
+                    rowid = row[0]
+                else:
+                    record = to_dict(w)
+                    rowid = conn.execute(
+                        "INSERT INTO works (key, is_oa, record, updated_at) VALUES (?, ?, ?, ?)",
+                        (key, int(w.is_oa), json_dumps(record), now),
+                    ).lastrowid
+                    added += 1
+                conn.execute(
+                    "INSERT INTO works_fts (rowid, title, authors, skills, venue) VALUES (?, ?, ?, ?, ?)",
+                    (rowid, record["title"], _join_names(record["authors"]), _join_names(record["skills"]), record["venue"]),
+                )
+        return added
+
+    def search(self, match: str, per_page: int, cursor: str) -> Dict[str, Any]:
+        """`match` is an FTS5 expression from query_compiler.compile_plan("local", q); "" lists everything."""
+        started = time.perf_counter()
+        offset = 0 if not cursor or cursor == "*" else max(0, int(cursor))
+        with self._connect() as conn:
+            if match:
+                total = conn.execute("SELECT count(*) FROM works_fts WHERE works_fts MATCH ?", (match,)).fetchone()[0]
+                rows = conn.execute(
+                    "SELECT w.record FROM works_fts JOIN works w ON w.id = works_fts.rowid"
+                    " WHERE works_fts MATCH ? ORDER BY w.is_oa DESC, bm25(works_fts) LIMIT ? OFFSET ?",
+                    (match, per_page, offset),
+                ).fetchall()
+            else:
+                total = conn.execute("SELECT count(*) FROM works").fetchone()[0]
+                rows = conn.execute(
+                    "SELECT record FROM works ORDER BY is_oa DESC, updated_at DESC LIMIT ? OFFSET ?",
+                    (per_page, offset),
+                ).fetchall()
+        results = [Work(**json_loads(r[0])) for r in rows]
+        self.queries += 1
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        next_cursor = str(offset + len(results)) if offset + len(results) < total else None
+        return {"results": results, "meta": {"count": total, "next_cursor": next_cursor}}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            works = conn.execute("SELECT count(*) FROM works").fetchone()[0]
+            by_source = dict(conn.execute(
+                "SELECT json_extract(record, '$.source'), count(*) FROM works GROUP BY 1"
+            ).fetchall()) if works else {}
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        latencies = sorted(self.latencies_ms)
+
+        def pct(p: float) -> Optional[float]:
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+        return {
+            "path": self.path,
+            "works": works,
+            "by_source": by_source,
+            "size_bytes": size,
+            "queries": self.queries,
+            "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+        }
+
+
+def index_from_env() -> Optional[LocalIndex]:
+    path = os.environ.get("LOCAL_INDEX_PATH", "")
+    return LocalIndex(path) if path else None
+
+
+# --- CLI -------------------------------------------------------------------------------------
+
+async def _harvest(index: LocalIndex, sources: List[str], q: str, limit: int) -> None:
+    # Reuses the app's export walker so ingest gets the same pooled client, max page sizes and prefetch
+    import app
+
+    try:
+        for source in sources:
+            total = added = 0
+            async with aclosing(app.iter_export_pages(source, q, "*")) as pages:
+                async for results, _ in pages:
+                    if limit:
+                        results = results[: limit - total]
+                    added += await asyncio.to_thread(index.ingest, results)
+                    total += len(results)
+                    print(f"{source}: {total} fetched, {added} new", file=sys.stderr)
+                    if limit and total >= limit:
+                        break
+    finally:
+        await app.close_http_client()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m local_index", description="Manage the local full-text index")
+    parser.add_argument("--path", default=os.environ.get("LOCAL_INDEX_PATH", "local_index.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="Harvest a query or keyword set into the index (re-run to refresh)")
+    ingest.add_argument("--q", default="")
+    ingest.add_argument("--keyset", default="", help="keywords.md categories: 'all' or comma-separated names")
+    ingest.add_argument("--source", default="all", choices=["openalex", "crossref", "arxiv", "all"])
+    ingest.add_argument("--limit", type=int, default=0, help="Max works per source (0 = everything)")
+    search = sub.add_parser("search", help="Query the index")
+    search.add_argument("q")
+    search.add_argument("--per-page", type=int, default=10)
+    sub.add_parser("stats", help="Index size and query latency")
+    args = parser.parse_args(argv)
+
+    index = LocalIndex(args.path)
+    if args.command == "ingest":
+        import app
+
+        q = app.build_query(args.q, args.keyset)
+        sources = list(app.FEDERATED_SOURCES) if args.source == "all" else [args.source]
+        asyncio.run(_harvest(index, sources, q, args.limit))
+        print(json_dumps(index.stats()).decode())
+    elif args.command == "search":
+        from query_compiler import compile_plan
+
+        page = index.search(compile_plan("local", args.q)[0], args.per_page, "*")
+        for w in page["results"]:
+            print(f"{'OA ' if w.is_oa else '   '}{w.year or '    '}  {w.title}  [{w.source}] {w.doi}")
+        print(json_dumps({"count": page["meta"]["count"], **index.stats()["latency_ms"]}).decode())
+    else:
+        print(json_dumps(index.stats()).decode())
+
+
+if __name__ == "__main__":
+    main()
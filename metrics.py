@@ -0,0 +1,155 @@
+import time
+import bisect
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple, Iterator, Callable, Iterable
+
+# Stages of a search request, in the order they happen (index: source=local lookups)
+STAGES = ("upstream", "index", "parse", "sort", "serialize")
+
+# Prometheus-style latency buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# stage -> seconds spent in it by the current request; set by TimingMiddleware.
+# Concurrent upstream calls (federated and split searches) add up, so a stage can exceed wall time.
+request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Metrics:
+    """In-process counters and histograms, rendered in the Prometheus text format (per worker)."""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.durations: Dict[str, Histogram] = {}
+        self.stages: Dict[Tuple[str, str], Histogram] = {}
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+    def observe_request(self, route: str, status: int, seconds: float, timings: Dict[str, float]) -> None:
+        self.requests[(route, status)] = self.requests.get((route, status), 0) + 1
+        self.durations.setdefault(route, Histogram()).observe(seconds)
+        for name, spent in timings.items():
+            self.stages.setdefault((route, name), Histogram()).observe(spent)
+
+    def add_collector(self, collect: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+        """`collect()` yields (name, type, help, labels, value) samples read at scrape time."""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        lines += _header("ai_search_requests_total", "counter", "HTTP requests by route and status")
+        for (route, status), n in sorted(self.requests.items()):
+            lines.append(f"ai_search_requests_total{_labels(route=route, status=str(status))} {n}")
+        lines += _header("ai_search_request_duration_seconds", "histogram", "Time to the last response byte")
+        for route, h in sorted(self.durations.items()):
+            lines += _histogram("ai_search_request_duration_seconds", h, route=route)
+        lines += _header("ai_search_stage_duration_seconds", "histogram", "Time per request spent in each stage")
+        for (route, name), h in sorted(self.stages.items()):
+            lines += _histogram("ai_search_stage_duration_seconds", h, route=route, stage=name)
+        # The text format wants each family's samples in one block, whatever order collectors yield them
+        families: Dict[str, List[str]] = {}
+        for collect in self.collectors:
+            for name, kind, help_text, labels, value in collect():
+                if name not in families:
+                    families[name] = _header(name, kind, help_text)
+                families[name].append(f"{name}{_labels(**labels)} {value}")
+        for family in families.values():
+            lines += family
+        return "\n".join(lines) + "\n"
+
+
+def _header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _labels(**labels: str) -> str:
+    if not labels:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _histogram(name: str, h: Histogram, **labels: str) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{_labels(**labels, le=str(bound))} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {h.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {h.count}")
+    return lines
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={timings[name] * 1000:.1f}" for name in STAGES if name in timings]
+    parts += [f"{name};dur={spent * 1000:.1f}" for name, spent in timings.items() if name not in STAGES]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """Times each request's stages: `Server-Timing` response header plus histograms in `metrics`.
+
+    Streaming responses send their headers before the work is done, so their header only covers
+    what happened up to then; the histograms are recorded once the last byte is sent.
+    """
+
+    def __init__(self, app, metrics: Metrics, routes: Callable[[], Iterable[str]]):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+        self._known: Optional[set] = None
+
+    def route_label(self, path: str) -> str:
+        # Label by route, never by raw path, so unknown URLs can't blow up the series count
+        if self._known is None:
+            self._known = set(self.routes())
+        return path if path in self._known else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - started).encode("latin-1")
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            self.metrics.observe_request(self.route_label(scope["path"]), status, time.perf_counter() - started, dict(timings))
@@ -0,0 +1,110 @@
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Sequence
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+@dataclass(slots=True)
+class Work:
+    """A search result from any source, reduced to the fields the clients use."""
+
+    id: str
+    source: str
+    title: str = ""
+    year: Optional[int] = None
+    venue: str = ""
+    publisher: str = ""
+    doi: str = ""
+    link: str = ""
+    pdf: str = ""
+    is_oa: bool = False
+    authors: List[str] = field(default_factory=list)
+    skills: List[str] = field(default_factory=list)
+    cited_by_count: Optional[int] = None
+
+
+@dataclass(slots=True)
+class Author:
+    id: str
+    display_name: str = ""
+    orcid: str = ""
+    works_count: Optional[int] = None
+    cited_by_count: Optional[int] = None
+
+
+WORK_FIELDS = Work.__slots__
+AUTHOR_FIELDS = Author.__slots__
+
+
+def strip_doi_prefix(doi: Optional[str]) -> str:
+    doi = (doi or "").strip()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"):
+        if doi.lower().startswith(prefix):
+            return doi[len(prefix):]
+    return doi
+
+
+def normalize_doi(doi: Optional[str]) -> str:
+    return strip_doi_prefix(doi).lower()
+
+
+def normalize_title(title: Optional[str]) -> str:
+    return re.sub(r"[\W_]+", " ", (title or "").lower()).strip()
+
+
+def work_dedupe_key(w: Work) -> str:
+    doi = normalize_doi(w.doi)
+    if doi:
+        return f"doi:{doi}"
+    title = normalize_title(w.title)
+    return f"title:{title}" if title else ""
+
+
+def parse_fields(fields: str, allowed: Sequence[str]) -> Optional[List[str]]:
+    """Parse a `fields=` projection; None means every field."""
+    names = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    if not names:
+        return None
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(allowed)})")
+    return names
+
+
+def to_dict(record: Any, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    return {name: getattr(record, name) for name in (fields or record.__slots__)}
+
+
+def page_to_dict(data: Dict[str, Any], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    return {**data, "results": [to_dict(r, fields) for r in data.get("results") or []]}
+
+
+def json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_loads(raw: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def encode_page(data: Dict[str, Any]) -> bytes:
+    """Cache codec: a search page whose results are Work or Author records."""
+    results = data.get("results") or []
+    entity = "authors" if results and isinstance(results[0], Author) else "works"
+    return json_dumps({**page_to_dict(data), "entity": entity})
+
+
+def decode_page(raw: Any) -> Dict[str, Any]:
+    data = json_loads(raw)
+    cls = Author if data.pop("entity", "works") == "authors" else Work
+    data["results"] = [cls(**r) for r in data.get("results") or []]
+    return data
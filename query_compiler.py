@@ -0,0 +1,371 @@
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple, Union
+
+# Longest native query we send to each upstream; longer plans are split into sub-queries.
+# Every sub-query costs one more rate-limited call per page, which matters most for arXiv
+# (1 call / 3s): its limit keeps the encoded URL well under the usual 8 KB request line
+# instead, so keyset=all (~1.6k chars) goes out as one query.
+MAX_QUERY_LENGTH = {
+    "openalex": int(os.environ.get("QUERY_MAX_LENGTH_OPENALEX", 1500)),
+    "crossref": int(os.environ.get("QUERY_MAX_LENGTH_CROSSREF", 1000)),
+    "arxiv": int(os.environ.get("QUERY_MAX_LENGTH_ARXIV", 4000)),
+    # SQLite FTS5 has no practical limit, so local plans are never split
+    "local": 1_000_000,
+}
+
+KEYWORDS_PATH = os.environ.get("KEYWORDS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.md"))
+
+
+@dataclass(frozen=True, slots=True)
+class Term:
+    text: str
+
+    @property
+    def wildcard(self) -> bool:
+        return self.text.endswith("*")
+
+    @property
+    def words(self) -> List[str]:
+        return self.text.split()
+
+
+@dataclass(frozen=True, slots=True)
+class And:
+    children: Tuple["Node", ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Or:
+    children: Tuple["Node", ...]
+
+
+Node = Union[Term, And, Or]
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+
+def _tokenize(q: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    q = q.strip()
+    while pos < len(q):
+        m = _TOKEN_RE.match(q, pos)
+        if not m or m.end() == pos:
+            raise QuerySyntaxError(f"Cannot parse query near: {q[pos:pos + 20]!r}")
+        pos = m.end()
+        if m.group(1):
+            tokens.append(("(", "("))
+        elif m.group(2):
+            tokens.append((")", ")"))
+        elif m.group(3) is not None:
+            tokens.append(("phrase", m.group(3)))
+        elif m.group(4) in ("AND", "OR"):
+            tokens.append((m.group(4), m.group(4)))
+        else:
+            tokens.append(("word", m.group(4)))
+    return tokens
+
+
+def _flatten(cls, children: List[Node]) -> Tuple[Node, ...]:
+    # (a AND b) AND c -> a AND b AND c, so the splitter sees every OR group at the top level
+    flat: List[Node] = []
+    for c in children:
+        flat.extend(c.children if isinstance(c, cls) else (c,))
+    return tuple(flat)
+
+
+class _Parser:
+    # expr := or_expr ([AND] or_expr)* ; or_expr := atom (OR atom)* ; atom := ( expr ) | "phrase" | word+
+    # Adjacent bare words are a bag of words (an AND binding tighter than OR), so
+    # `(Autonomous Ship* OR Crew)` means (Autonomous AND Ship*) OR Crew; only quoted text is a
+    # phrase. Anything next to a group or phrase is an implicit AND too: `learning (survey OR review)`.
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def parse(self) -> Node:
+        node = self.expr()
+        if self.peek() is not None:
+            raise QuerySyntaxError("Unbalanced ')' in query")
+        return node
+
+    def expr(self) -> Node:
+        children = [self.or_expr()]
+        while self.peek() in ("AND", "(", "phrase", "word"):
+            if self.peek() == "AND":
+                self.pos += 1
+            children.append(self.or_expr())
+        return children[0] if len(children) == 1 else And(_flatten(And, children))
+
+    def or_expr(self) -> Node:
+        children = [self.atom()]
+        while self.peek() == "OR":
+            self.pos += 1
+            children.append(self.atom())
+        return children[0] if len(children) == 1 else Or(_flatten(Or, children))
+
+    def atom(self) -> Node:
+        kind = self.peek()
+        if kind == "(":
+            self.pos += 1
+            node = self.expr()
+            if self.peek() != ")":
+                raise QuerySyntaxError("Missing ')' in query")
+            self.pos += 1
+            return node
+        if kind == "phrase":
+            self.pos += 1
+            return Term(self.tokens[self.pos - 1][1].strip())
+        if kind == "word":
+            words = []
+            while self.peek() == "word":
+                words.append(Term(self.tokens[self.pos][1]))
+                self.pos += 1
+            return words[0] if len(words) == 1 else And(tuple(words))
+        raise QuerySyntaxError(f"Expected a term, got {kind or 'end of query'}")
+
+
+_OPERATOR_RE = re.compile(r"\bAND\b|\bOR\b")
+
+
+def is_boolean_query(q: str) -> bool:
+    # Parentheses alone don't count: `machine learning (survey)` stays free text
+    return bool(_OPERATOR_RE.search(q or "") or re.search(r'["*]', q or ""))
+
+
+def parse_query(q: str) -> Optional[Node]:
+    """Parse a boolean query; None for plain free text, which each source handles natively.
+
+    Only input using AND / OR must parse: other text with stray quotes or parentheses, like
+    `O'Brien "seafarer`, falls back to free text.
+    """
+    if not is_boolean_query(q):
+        return None
+    try:
+        return _Parser(_tokenize(q)).parse()
+    except QuerySyntaxError:
+        if _OPERATOR_RE.search(q):
+            raise
+        return None
+
+
+# --- Per-source emitters -------------------------------------------------------------------
+
+def _join(op: str, parts: List[str]) -> str:
+    return parts[0] if len(parts) == 1 else "(" + f" {op} ".join(parts) + ")"
+
+
+def to_arxiv(node: Node) -> str:
+    if isinstance(node, Term):
+        words = node.words
+        if len(words) == 1:
+            return f"all:{words[0]}"
+        if node.wildcard:
+            # arXiv can't prefix-match a phrase, so require every word instead
+            return _join("AND", [f"all:{w}" for w in words])
+        return f'all:"{node.text}"'
+    op = "AND" if isinstance(node, And) else "OR"
+    return _join(op, [to_arxiv(c) for c in node.children])
+
+
+def _word_forms(word: str, expansions: Dict[str, List[str]]) -> List[str]:
+    """A trailing-* word as whole words: its keywords.md expansion, else the bare stem."""
+    stem = word.rstrip("*")
+    return expansions.get(stem.lower(), [stem]) if word.endswith("*") else [word]
+
+
+def to_openalex(node: Node) -> str:
+    return _openalex(node, load_wildcard_expansions())
+
+
+def _openalex(node: Node, expansions: Dict[str, List[str]]) -> str:
+    if isinstance(node, Term):
+        # OpenAlex ignores wildcards but stems unquoted words, which covers Seafarer* -> seafarers;
+        # stems that aren't words (Competenc*) only match through their expansion
+        words = [_join("OR", _word_forms(w, expansions)) for w in node.words]
+        if len(words) == 1:
+            return words[0]
+        if node.wildcard:
+            return _join("AND", words)
+        return f'"{" ".join(words)}"'
+    op = "AND" if isinstance(node, And) else "OR"
+    return _join(op, [_openalex(c, expansions) for c in node.children])
+
+
+def to_crossref(node: Node) -> str:
+    return _crossref(node, load_wildcard_expansions())
+
+
+def _crossref(node: Node, expansions: Dict[str, List[str]]) -> str:
+    # Crossref's query is relevance-ranked bag-of-words: no operators, so records matching
+    # terms from every category rank first
+    if isinstance(node, Term):
+        return " ".join(f for w in node.words for f in _word_forms(w, expansions))
+    seen: Dict[str, None] = {}
+    for c in node.children:
+        seen.setdefault(_crossref(c, expansions), None)
+    return " ".join(seen)
+
+
+def unexpanded_wildcards(node: Node) -> List[str]:
+    """Wildcard terms OpenAlex and Crossref receive as a bare stem (no keywords.md expansion)."""
+    if isinstance(node, Term):
+        last = node.words[-1] if node.words else ""
+        if last.endswith("*") and last.rstrip("*").lower() not in load_wildcard_expansions():
+            return [node.text]
+        return []
+    found: Dict[str, None] = {}
+    for c in node.children:
+        found.update(dict.fromkeys(unexpanded_wildcards(c)))
+    return list(found)
+
+
+def to_fts5(node: Node) -> str:
+    if isinstance(node, Term):
+        # Quoting keeps punctuation out of FTS5's query grammar; `"remote ship"*` prefix-matches the last word
+        text = node.text.rstrip("*").replace('"', '""')
+        return f'"{text}"' + ("*" if node.wildcard else "")
+    op = "AND" if isinstance(node, And) else "OR"
+    return _join(op, [to_fts5(c) for c in node.children])
+
+
+EMITTERS = {"openalex": to_openalex, "crossref": to_crossref, "arxiv": to_arxiv, "local": to_fts5}
+
+
+def split_node(node: Node, source: str, max_length: int) -> List[Node]:
+    """Split the widest OR group until every part fits; the union of the parts matches the original."""
+    emit = EMITTERS[source]
+    if len(emit(node)) <= max_length:
+        return [node]
+    if isinstance(node, Or) and len(node.children) > 1:
+        half = len(node.children) // 2
+        halves = [node.children[:half], node.children[half:]]
+        return [p for h in halves for p in split_node(h[0] if len(h) == 1 else Or(h), source, max_length)]
+    if isinstance(node, And):
+        splittable = [i for i, c in enumerate(node.children) if isinstance(c, Or) and len(c.children) > 1]
+        if splittable:
+            i = max(splittable, key=lambda j: len(emit(node.children[j])))
+            child = node.children[i]
+            half = len(child.children) // 2
+            parts = []
+            for h in (child.children[:half], child.children[half:]):
+                replaced = node.children[:i] + (h[0] if len(h) == 1 else Or(h),) + node.children[i + 1:]
+                parts.extend(split_node(And(replaced), source, max_length))
+            return parts
+    return [node]
+
+
+# --- Keyword sets ----------------------------------------------------------------------------
+
+def _table_rows(markdown: str, heading: str) -> List[Tuple[str, List[str]]]:
+    """(first cell, quoted terms in the second) for each row of the table under `## heading`."""
+    rows = []
+    in_table = False
+    for line in markdown.splitlines():
+        line = line.strip()
+        if line.startswith("## "):
+            in_table = line[3:].strip().lower() == heading
+            continue
+        if not in_table or not line.startswith("|") or set(line) <= set("|-: "):
+            continue
+        cells = [c.strip() for c in line.strip("|").split("|")]
+        if len(cells) < 2:
+            continue
+        terms = re.findall(r'"([^"]+)"', cells[1])
+        if terms:
+            rows.append((cells[0], terms))
+    return rows
+
+
+def parse_keyword_categories(markdown: str) -> Dict[str, List[str]]:
+    """Read the `| Category | "term", "term" |` table from keywords.md."""
+    return dict(_table_rows(markdown, "boolean categories"))
+
+
+def parse_wildcard_expansions(markdown: str) -> Dict[str, List[str]]:
+    """Read the `| Stem* | "word", "word" |` table from keywords.md, keyed by lowercase stem."""
+    return {stem.rstrip("*").lower(): forms for stem, forms in _table_rows(markdown, "wildcard expansions")}
+
+
+def _keyword_set_node(categories: Dict[str, List[str]], names: Optional[List[str]] = None) -> Node:
+    unknown = [n for n in names or [] if n not in categories]
+    if unknown:
+        raise QuerySyntaxError(f"Unknown keyword categories: {', '.join(unknown)}")
+    groups = []
+    for name, terms in categories.items():
+        if names and name not in names:
+            continue
+        group = tuple(Term(t) for t in terms)
+        groups.append(group[0] if len(group) == 1 else Or(group))
+    if not groups:
+        raise QuerySyntaxError("Keyword set has no categories")
+    return groups[0] if len(groups) == 1 else And(tuple(groups))
+
+
+@lru_cache(maxsize=8)
+def _load_keyword_file(path: str, mtime: float) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    with open(path, encoding="utf-8") as f:
+        markdown = f.read()
+    return parse_keyword_categories(markdown), parse_wildcard_expansions(markdown)
+
+
+def load_keyword_categories(path: str = KEYWORDS_PATH) -> Dict[str, List[str]]:
+    return _load_keyword_file(path, os.path.getmtime(path))[0]
+
+
+def load_wildcard_expansions(path: str = KEYWORDS_PATH) -> Dict[str, List[str]]:
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    return _load_keyword_file(path, mtime)[1]
+
+
+def keyword_set_query(categories: Optional[List[str]] = None, path: str = KEYWORDS_PATH) -> str:
+    """Render the keywords.md categories (optionally a subset) as a boolean query string."""
+    node = _keyword_set_node(load_keyword_categories(path), categories)
+    return to_query_string(node)
+
+
+def to_query_string(node: Node) -> str:
+    if isinstance(node, Term):
+        return f'"{node.text}"' if " " in node.text else node.text
+    op = "AND" if isinstance(node, And) else "OR"
+    return _join(op, [to_query_string(c) for c in node.children])
+
+
+# --- Plans -----------------------------------------------------------------------------------
+
+def compile_plan(source: str, q: str) -> Tuple[str, ...]:
+    """Native query string(s) for `source`; more than one means run them all and union the results."""
+    try:
+        mtime = os.path.getmtime(KEYWORDS_PATH)
+    except OSError:
+        mtime = 0.0
+    return _compile_plan(source, (q or "").strip(), mtime)
+
+
+@lru_cache(maxsize=512)
+def _compile_plan(source: str, q: str, keywords_mtime: float) -> Tuple[str, ...]:
+    # keywords_mtime only keys the cache, so edited wildcard expansions take effect
+    node = parse_query(q)
+    if node is None:
+        if source == "arxiv":
+            return (f"all:{q}" if q else "",)
+        if source == "local":
+            return (" AND ".join(to_fts5(Term(w)) for w in q.split()),)
+        return (q,)
+    emit = EMITTERS[source]
+    return tuple(emit(part) for part in split_node(node, source, MAX_QUERY_LENGTH[source]))
@@ -0,0 +1,341 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import contextvars
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Callable, Awaitable, List, Tuple
+
+import httpx
+
+# Lower runs first: UI searches jump ahead of exports/harvests, which jump ahead of cache refreshes
+INTERACTIVE, BULK, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk", BACKGROUND: "background"}
+
+# Set by the caller (export, CLI harvest, cache refresh); tasks inherit it when created
+request_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling upstream while a source's circuit breaker is open or its queue is too long,
+    and after retries when the source is still throttling (429), unavailable (503) or its breaker opened."""
+
+    def __init__(self, source: str, retry_after: float):
+        super().__init__(f"{source} is temporarily unavailable; retry in {retry_after:.0f}s")
+        self.source = source
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_timeout` lets one trial call through."""
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - (self.opened_at or 0)))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def abandon_trial(self) -> None:
+        # The trial call was cancelled before it told us anything; let the next caller try instead
+        self.trial_in_flight = False
+
+
+class HostScheduler:
+    """Admits requests to one upstream in priority order, within its token bucket and concurrency cap."""
+
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int, breaker: CircuitBreaker,
+                 queue_timeout: Optional[float] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waits_ms: deque = deque(maxlen=1000)
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0, "queue_timeouts": 0}
+
+    def pause(self, seconds: float) -> None:
+        # A 429 / Retry-After holds back every queued request, not just the one that got it
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot; True if this call is the breaker's half-open trial."""
+        trial = self.breaker.state == "half-open"
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise UpstreamUnavailable(self.name, self.breaker.retry_after())
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Queue state is loop-bound; start fresh if the app was restarted on a new loop
+            self._loop, self._wakeup, self._dispatcher, self._heap, self.in_flight = loop, asyncio.Event(), None, [], 0
+        started = time.monotonic()
+        fut = loop.create_future()
+        self._seq += 1
+        heapq.heappush(self._heap, (priority, self._seq, fut))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        else:
+            self._wakeup.set()
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if fut.done() and not fut.cancelled():
+                self.release()  # admitted just as the caller gave up
+            if trial:
+                self.breaker.abandon_trial()
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["queue_timeouts"] += 1
+                raise UpstreamUnavailable(self.name, self.estimated_wait()) from None
+            raise
+        self.waits_ms.append((time.monotonic() - started) * 1000)
+        return trial
+
+    def estimated_wait(self) -> float:
+        queued = sum(1 for _, _, fut in self._heap if not fut.done())
+        rate_wait = queued / self.bucket.rate if self.bucket.rate > 0 else 0.0
+        return max(1.0, rate_wait, self.paused_until - time.monotonic())
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        while self._heap:
+            if self._heap[0][2].cancelled():
+                heapq.heappop(self._heap)
+                continue
+            delay = max(self.bucket.delay(), self.paused_until - time.monotonic())
+            if self.in_flight >= self.max_concurrency or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay if delay > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, fut = heapq.heappop(self._heap)
+            self.bucket.take()
+            self.in_flight += 1
+            fut.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.waits_ms)
+        queued: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, fut in self._heap:
+            if not fut.done():
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+
+        def pct(p: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else None
+
+        return {
+            **self.stats,
+            "queue_depth": sum(queued.values()),
+            "queued_by_priority": queued,
+            "in_flight": self.in_flight,
+            "rate_per_s": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "max_concurrency": self.max_concurrency,
+            "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "circuit": self.breaker.state,
+            "wait_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": round(waits[-1], 1) if waits else None},
+        }
+
+
+class UpstreamScheduler:
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.hosts: Dict[str, HostScheduler] = {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def add_host(self, netloc: str, host: HostScheduler) -> None:
+        self.hosts[netloc] = host
+
+    def backoff(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, netloc: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        host = self.hosts.get(netloc)
+        if host is None:
+            return await send()
+        priority = request_priority.get()
+        attempt = 0
+        while True:
+            trial = await host.acquire(priority)
+            host.stats["requests"] += 1
+            resp: Optional[httpx.Response] = None
+            try:
+                resp = await send()
+            except (httpx.TimeoutException, httpx.TransportError):
+                host.stats["failures"] += 1
+                host.breaker.record_failure()
+                if attempt >= self.max_retries or host.breaker.state == "open":
+                    raise
+            except BaseException:
+                # Cancelled (a federated deadline, an abandoned export prefetch) or an unexpected error
+                if trial:
+                    host.breaker.abandon_trial()
+                raise
+            finally:
+                host.release()
+            if resp is None:
+                await asyncio.sleep(self.backoff(attempt))
+            else:
+                self._adapt_rate(host, resp)
+                if resp.status_code not in RETRY_STATUSES:
+                    host.breaker.record_success()
+                    return resp
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                if resp.status_code == 429:
+                    # Throttling means "slow down", not "down": it pauses the host but doesn't trip the breaker
+                    host.stats["throttled"] += 1
+                    host.breaker.record_success()
+                    host.pause(retry_after if retry_after is not None else self.backoff(attempt))
+                else:
+                    host.stats["failures"] += 1
+                    host.breaker.record_failure()
+                    if retry_after is not None:
+                        host.pause(retry_after)
+                if host.breaker.state == "open":
+                    await resp.aclose()
+                    raise UpstreamUnavailable(host.name, retry_after if retry_after is not None else host.breaker.retry_after())
+                if attempt >= self.max_retries:
+                    if resp.status_code not in (429, 503):
+                        return resp
+                    await resp.aclose()
+                    raise UpstreamUnavailable(host.name, retry_after if retry_after is not None else self.backoff(attempt))
+                await resp.aclose()
+                await asyncio.sleep(retry_after if retry_after is not None else self.backoff(attempt))
+            attempt += 1
+            host.stats["retries"] += 1
+
+    @staticmethod
+    def _adapt_rate(host: HostScheduler, resp: httpx.Response) -> None:
+        # Crossref advertises its current limit, e.g. X-Rate-Limit-Limit: 50, X-Rate-Limit-Interval: 1s
+        limit, interval = resp.headers.get("X-Rate-Limit-Limit"), resp.headers.get("X-Rate-Limit-Interval")
+        if not limit or not interval:
+            return
+        try:
+            advertised = float(limit) / float(interval.rstrip("s"))
+        except ValueError:
+            return
+        if advertised > 0:
+            host.bucket.rate = min(host.bucket.rate, advertised)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {host.name: host.snapshot() for host in self.hosts.values()}
+
+
+# Per-worker defaults, roughly each API's published polite limits
+DEFAULT_LIMITS = {
+    "openalex": {"rate": 10.0, "burst": 10.0, "concurrency": 10},
+    "crossref": {"rate": 10.0, "burst": 5.0, "concurrency": 5},
+    "arxiv": {"rate": 1 / 3, "burst": 1.0, "concurrency": 1},
+}
+
+
+def scheduler_from_env(hosts: Dict[str, str]) -> Optional[UpstreamScheduler]:
+    """`hosts` maps source name -> netloc of its base URL."""
+    if os.environ.get("SCHEDULER_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    scheduler = UpstreamScheduler(
+        max_retries=int(os.environ.get("UPSTREAM_MAX_RETRIES", 3)),
+        backoff_base=float(os.environ.get("UPSTREAM_BACKOFF_BASE", 0.5)),
+        backoff_max=float(os.environ.get("UPSTREAM_BACKOFF_MAX", 30)),
+    )
+    # 0 = wait for a slot indefinitely
+    queue_timeout = float(os.environ.get("UPSTREAM_QUEUE_TIMEOUT", 60)) or None
+    for source, netloc in hosts.items():
+        defaults = DEFAULT_LIMITS[source]
+        key = source.upper()
+        scheduler.add_host(netloc, HostScheduler(
+            source,
+            rate=float(os.environ.get(f"RATE_LIMIT_{key}", defaults["rate"])),
+            burst=float(os.environ.get(f"RATE_BURST_{key}", defaults["burst"])),
+            max_concurrency=int(os.environ.get(f"MAX_CONCURRENCY_{key}", defaults["concurrency"])),
+            breaker=CircuitBreaker(
+                threshold=int(os.environ.get("BREAKER_THRESHOLD", 5)),
+                reset_timeout=float(os.environ.get("BREAKER_RESET_TIMEOUT", 30)),
+            ),
+            queue_timeout=queue_timeout,
+        ))
+    return scheduler
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from cache import SearchCache
+
+
+def test_hit_after_miss():
+    async def run():
+        cache = SearchCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return {"results": [1]}
+
+        assert await cache.get_or_load("arxiv", "k", loader) == {"results": [1]}
+        assert await cache.get_or_load("arxiv", "k", loader) == {"results": [1]}
+        assert len(calls) == 1
+        assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache = SearchCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "page"
+
+        results = await asyncio.gather(*(cache.get_or_load("arxiv", "k", loader) for _ in range(5)))
+        assert results == ["page"] * 5
+        assert len(calls) == 1 and cache.stats["coalesced"] == 4
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def run():
+        cache = SearchCache()
+
+        async def loader():
+            await asyncio.sleep(0.2)
+            return "page"
+
+        leader = asyncio.ensure_future(asyncio.wait_for(cache.get_or_load("arxiv", "k", loader), 0.05))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.get_or_load("arxiv", "k", loader))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert await follower == "page"
+        assert await cache.get_or_load("arxiv", "k", loader) == "page"
+        assert cache.stats["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_load_cancelled_when_every_caller_gives_up():
+    async def run():
+        cache = SearchCache()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.get_or_load("arxiv", "k", slow), 0.05)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert cache.snapshot()["inflight"] == 0
+
+        async def fast():
+            return "page"
+
+        assert await cache.get_or_load("arxiv", "k", fast) == "page"
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def run():
+        cache = SearchCache()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(cache.get_or_load("arxiv", "k", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats["errors"] == 1
+        assert cache.snapshot()["entries"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,26 @@
+import os
+
+from app import work_from_arxiv
+from arxiv_atom import parse_feed
+from local_index import LocalIndex
+from models import Work
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench", "fixtures")
+
+
+def test_ingest_arxiv_page_with_nameless_author(tmp_path):
+    with open(os.path.join(FIXTURES, "arxiv_edge_cases.xml"), "rb") as f:
+        entries, _ = parse_feed(f.read())
+    works = [work_from_arxiv(e) for e in entries]
+    assert all(isinstance(name, str) for w in works for name in w.authors + w.skills)
+
+    index = LocalIndex(str(tmp_path / "index.db"))
+    assert index.ingest(works) == len(works)
+    assert index.search('"Padded"', 10, "*")["meta"]["count"] == 1
+
+
+def test_ingest_tolerates_none_in_stored_names(tmp_path):
+    index = LocalIndex(str(tmp_path / "index.db"))
+    work = Work(id="x", source="arxiv", title="Nameless coauthor", authors=["Ada Lovelace", None])
+    assert index.ingest([work]) == 1
+    assert index.search('"lovelace"', 10, "*")["meta"]["count"] == 1
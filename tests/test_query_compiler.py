@@ -0,0 +1,74 @@
+import pytest
+
+from query_compiler import (
+    MAX_QUERY_LENGTH, And, Or, QuerySyntaxError, Term, compile_plan, keyword_set_query, parse_query,
+    split_node, to_arxiv, to_crossref, to_fts5, to_openalex, unexpanded_wildcards,
+)
+
+
+def test_free_text_falls_back_to_native_query():
+    assert parse_query("machine learning survey") is None
+    # Stray brackets without AND / OR aren't a syntax error, just free text
+    assert parse_query("COVID-19 (SARS-CoV-2)") is None
+    assert compile_plan("openalex", "COVID-19 (SARS-CoV-2)") == ("COVID-19 (SARS-CoV-2)",)
+    assert compile_plan("arxiv", "machine learning") == ("all:machine learning",)
+    assert compile_plan("local", "machine learning") == ('"machine" AND "learning"',)
+    with pytest.raises(QuerySyntaxError):
+        parse_query("(ship AND crew")
+
+
+def test_implicit_and_next_to_groups():
+    assert parse_query("(a OR b) c") == And((Or((Term("a"), Term("b"))), Term("c")))
+    assert parse_query('"remote ship" (crew OR seafarer)') == And((Term("remote ship"), Or((Term("crew"), Term("seafarer")))))
+
+
+def test_phrase_versus_bag_of_words():
+    bag = parse_query("machine learning AND survey")
+    assert bag == And((Term("machine"), Term("learning"), Term("survey")))
+    assert to_arxiv(bag) == "(all:machine AND all:learning AND all:survey)"
+    assert to_openalex(bag) == "(machine AND learning AND survey)"
+
+    phrase = parse_query('"machine learning" AND survey')
+    assert phrase == And((Term("machine learning"), Term("survey")))
+    assert to_arxiv(phrase) == '(all:"machine learning" AND all:survey)'
+    assert to_openalex(phrase) == '("machine learning" AND survey)'
+    assert to_fts5(phrase) == '("machine learning" AND "survey")'
+    # Crossref has no operators either way
+    assert to_crossref(bag) == to_crossref(phrase) == "machine learning survey"
+
+
+def test_wildcard_expansion():
+    node = parse_query("Competenc* AND Seafarer*")
+    assert to_openalex(node) == "((competence OR competences OR competency OR competencies) AND Seafarer)"
+    assert to_crossref(node) == "competence competences competency competencies Seafarer"
+    assert to_arxiv(node) == "(all:Competenc* AND all:Seafarer*)"
+    assert to_fts5(node) == '("Competenc"* AND "Seafarer"*)'
+    assert unexpanded_wildcards(node) == ["Seafarer*"]
+    # arXiv can't prefix-match a phrase, so it requires every word
+    assert to_arxiv(parse_query('"Autonomous Ship*"')) == "(all:Autonomous AND all:Ship*)"
+
+
+def test_split_node_parts_union_to_the_original_and_fit():
+    node = parse_query("ship AND (alpha OR beta OR gamma OR delta)")
+    parts = split_node(node, "openalex", 30)
+    assert parts == [
+        And((Term("ship"), Or((Term("alpha"), Term("beta"))))),
+        And((Term("ship"), Or((Term("gamma"), Term("delta"))))),
+    ]
+    assert all(len(to_openalex(p)) <= 30 for p in parts)
+    assert split_node(node, "openalex", 1000) == [node]
+    # Nothing left to split: the node goes out as is
+    assert split_node(Term("seafarer"), "openalex", 3) == [Term("seafarer")]
+
+
+def test_keyset_all_compiles_to_one_query_per_source():
+    q = keyword_set_query()
+    for source in ("arxiv", "openalex", "crossref", "local"):
+        plan = compile_plan(source, q)
+        assert len(plan) == 1
+        assert len(plan[0]) <= MAX_QUERY_LENGTH[source]
+    assert compile_plan("arxiv", q)[0].startswith("(((all:Maritime AND all:Autonomous AND all:Surface AND all:Ship*) OR ")
+    assert compile_plan("openalex", q)[0].startswith("(((Maritime AND Autonomous AND Surface AND Ship) OR ")
+    assert compile_plan("crossref", q)[0].startswith("Maritime Autonomous Surface Ship Autonomous Ship ")
+    assert compile_plan("local", q)[0].startswith('(("Maritime Autonomous Surface Ship"* OR ')
+    assert "(" not in compile_plan("crossref", q)[0]
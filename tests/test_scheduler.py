@@ -0,0 +1,206 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import scheduler
+from scheduler import CircuitBreaker, HostScheduler, TokenBucket, UpstreamScheduler, UpstreamUnavailable
+
+NETLOC = "upstream.test"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only scheduler's view of time; the event loop keeps the real clock
+    monkeypatch.setattr(scheduler, "time", SimpleNamespace(monotonic=clock, time=time.time))
+    return clock
+
+
+def make_scheduler(max_concurrency=1, threshold=5, reset_timeout=30.0, queue_timeout=None, max_retries=0):
+    host = HostScheduler(
+        "test", rate=1000.0, burst=1000.0, max_concurrency=max_concurrency,
+        breaker=CircuitBreaker(threshold, reset_timeout), queue_timeout=queue_timeout,
+    )
+    s = UpstreamScheduler(max_retries=max_retries, backoff_base=0.0)
+    s.add_host(NETLOC, host)
+    return s, host
+
+
+async def ok() -> httpx.Response:
+    return httpx.Response(200)
+
+
+async def hang() -> httpx.Response:
+    await asyncio.sleep(3600)
+    return httpx.Response(200)
+
+
+def test_token_bucket_burst_then_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    for _ in range(3):
+        assert bucket.delay() == 0.0
+        bucket.take()
+    assert bucket.delay() == pytest.approx(0.5)
+    clock.now += 0.25
+    assert bucket.delay() == pytest.approx(0.25)
+    clock.now += 10
+    bucket.take()
+    # Refill is capped at the burst size
+    assert bucket.tokens == pytest.approx(2.0)
+
+
+def test_breaker_opens_after_threshold_and_allows_one_trial(clock):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(30)
+
+    clock.now += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+
+    breaker.record_failure()
+    assert breaker.state == "open"  # a failed trial re-opens for a full reset_timeout
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_breaker_abandoned_trial_lets_next_caller_try(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.abandon_trial()
+    assert breaker.allow()
+
+
+def test_cancelled_send_releases_slot():
+    async def run():
+        s, host = make_scheduler(max_concurrency=1)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(s.request(NETLOC, hang), 0.05)
+        assert host.in_flight == 0
+        resp = await asyncio.wait_for(s.request(NETLOC, ok), 1)
+        assert resp.status_code == 200
+        assert host.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_while_queued_does_not_leak():
+    async def run():
+        s, host = make_scheduler(max_concurrency=1)
+        holder = asyncio.ensure_future(s.request(NETLOC, hang))
+        await asyncio.sleep(0.01)
+        assert host.in_flight == 1
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(s.request(NETLOC, ok), 0.05)
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        assert host.in_flight == 0
+        assert (await asyncio.wait_for(s.request(NETLOC, ok), 1)).status_code == 200
+
+    asyncio.run(run())
+
+
+def test_queue_wait_is_bounded():
+    async def run():
+        s, host = make_scheduler(max_concurrency=1, queue_timeout=0.05)
+        holder = asyncio.ensure_future(s.request(NETLOC, hang))
+        await asyncio.sleep(0.01)
+        with pytest.raises(UpstreamUnavailable) as excinfo:
+            await s.request(NETLOC, ok)
+        assert excinfo.value.retry_after >= 1
+        assert host.stats["queue_timeouts"] == 1
+        assert host.snapshot()["queue_depth"] == 0
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        assert host.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_half_open_trial_is_abandoned():
+    async def fail() -> httpx.Response:
+        raise httpx.ConnectError("down")
+
+    async def run():
+        s, host = make_scheduler(threshold=1, reset_timeout=30)
+        with pytest.raises(httpx.ConnectError):
+            await s.request(NETLOC, fail)
+        assert host.breaker.state == "open"
+        with pytest.raises(UpstreamUnavailable):
+            await s.request(NETLOC, ok)
+
+        host.breaker.opened_at -= 30
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(s.request(NETLOC, hang), 0.05)
+        assert not host.breaker.trial_in_flight
+        assert host.in_flight == 0
+        assert (await s.request(NETLOC, ok)).status_code == 200
+        assert host.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_retries_5xx_then_succeeds():
+    responses = [httpx.Response(503), httpx.Response(200)]
+
+    async def flaky() -> httpx.Response:
+        return responses.pop(0)
+
+    async def run():
+        s, host = make_scheduler(max_retries=2)
+        resp = await s.request(NETLOC, flaky)
+        assert resp.status_code == 200
+        assert host.stats["retries"] == 1 and host.stats["failures"] == 1
+        assert host.breaker.failures == 0 and host.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_final_throttle_raises_unavailable_with_retry_after(clock):
+    async def throttled() -> httpx.Response:
+        return httpx.Response(429, headers={"Retry-After": "7"})
+
+    async def run():
+        s, host = make_scheduler()
+        with pytest.raises(UpstreamUnavailable) as excinfo:
+            await s.request(NETLOC, throttled)
+        assert excinfo.value.retry_after == 7
+        assert host.stats["throttled"] == 1 and host.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_breaker_opening_during_retries_raises_unavailable(clock):
+    calls = []
+
+    async def failing() -> httpx.Response:
+        calls.append(1)
+        return httpx.Response(502)
+
+    async def run():
+        s, host = make_scheduler(threshold=2, reset_timeout=30.0, max_retries=5)
+        with pytest.raises(UpstreamUnavailable) as excinfo:
+            await s.request(NETLOC, failing)
+        assert len(calls) == 2 and host.breaker.state == "open"
+        assert excinfo.value.retry_after == pytest.approx(30.0)
+
+    asyncio.run(run())